@@ -1,8 +1,10 @@
 import asyncio
+import logging
 import os
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
 from fastapi_discord import RateLimited, Unauthorized
 from fastapi_discord.exceptions import ClientSessionNotInitialized
@@ -11,9 +13,32 @@ from starlette.middleware.sessions import SessionMiddleware
 from db import connect_db, disconnect_db
 from routes.discord import discord_router
 from routes.valorant import valorant
+from services.accounts import check_indexes
+from services.leaderboard import leaderboard
+from services.write_batcher import account_writes
 from utils.discord_bots import bot1, bot2
+from utils.henrik import henrik
 from utils.update_data import UpdateAllUsersBackgroundRunner
 
+
+def setup_logging(*names):
+    """Send the app/service/util module loggers to log/api.log and stderr; the root handler only keeps update_data.py."""
+    formatter = logging.Formatter('%(asctime)s [%(levelname)s] [%(filename)s:%(lineno)d] - %(message)s',
+                                  datefmt='%d/%m/%Y %H:%M:%S')
+    file_handler = logging.FileHandler('log/api.log')
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    for name in names:
+        logger = logging.getLogger(name)
+        logger.setLevel(logging.INFO)
+        logger.addHandler(file_handler)
+        logger.addHandler(stream_handler)
+
+
+setup_logging('app', 'services', 'utils')
+logger = logging.getLogger(__name__)
+
 app = FastAPI()
 
 update_all_users_runner = UpdateAllUsersBackgroundRunner()
@@ -35,6 +60,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses such as the full leaderboard
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 # Add Session middleware
 app.add_middleware(
     SessionMiddleware,
@@ -47,6 +75,27 @@ def on_startup():
     connect_db()
 
 
+@app.on_event("startup")
+async def check_db_indexes():
+    try:
+        await check_indexes()
+    except Exception:
+        logger.exception("Index check failed")
+
+
+@app.on_event("startup")
+async def load_leaderboard():
+    try:
+        await leaderboard.rebuild()
+    except Exception:
+        logger.exception("Failed to load leaderboard snapshot")
+
+
+@app.on_event("startup")
+async def start_henrik_client():
+    await henrik.start()
+
+
 @app.on_event('startup')
 async def update_users_on_startup():
     asyncio.create_task(update_all_users_runner.run_update_all_users())
@@ -58,11 +107,21 @@ async def start_bots_on_startup():
     asyncio.create_task(bot2.run())
 
 
+@app.on_event("shutdown")
+async def flush_account_writes():
+    await account_writes.flush()
+
+
 @app.on_event("shutdown")
 def on_shutdown():
     disconnect_db()
 
 
+@app.on_event("shutdown")
+async def close_henrik_client():
+    await henrik.close()
+
+
 # Include routers
 app.include_router(discord_router)
 app.include_router(valorant)
@@ -0,0 +1,54 @@
+"""Member-to-account lookup cost for one Discord role sync cycle.
+
+Times finding the account of each of 10,000 guild members in a 5,000-account
+leaderboard, with the previous per-member linear scan against building one
+``LeaderboardIndex`` per snapshot and looking members up by discord_id.
+
+Run from the repository root:
+
+    python -m benchmarks.discord_role_lookup
+"""
+import random
+import time
+
+from utils.discord_leaderboard import LeaderboardIndex
+
+MEMBERS = 10000
+ACCOUNTS = 5000
+TIERS = ['Iron 1', 'Bronze 2', 'Silver 3', 'Gold 1', 'Platinum 2', 'Diamond 3', 'Ascendant 1', 'Immortal 2', 'Radiant']
+
+
+def linear_scan(member_ids, rows):
+    for discord_id in member_ids:
+        next((user for user in rows if int(user['discord_id']) == discord_id), None)
+
+
+def indexed(member_ids, rows):
+    index = LeaderboardIndex(rows)
+    for discord_id in member_ids:
+        index.by_discord_id.get(discord_id)
+
+
+def timed(func, *arguments) -> float:
+    start = time.perf_counter()
+    func(*arguments)
+    return time.perf_counter() - start
+
+
+def main():
+    random.seed(0)
+    member_ids = random.sample(range(10 ** 17, 10 ** 17 + 10 ** 7), MEMBERS)
+    registered = random.sample(member_ids, ACCOUNTS)
+    rows = [{'discord_id': discord_id, 'discord_username': f'user{discord_id}',
+             'currenttierpatched': random.choice(TIERS)} for discord_id in registered]
+
+    before_seconds = timed(linear_scan, member_ids, rows)
+    after_seconds = timed(indexed, member_ids, rows)
+    print(f"{MEMBERS} members, {ACCOUNTS} accounts")
+    print(f"linear scan per member : {before_seconds * 1000:10.2f} ms/cycle")
+    print(f"dict index             : {after_seconds * 1000:10.2f} ms/cycle")
+    print(f"speedup                : {before_seconds / after_seconds:10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Per-document cost of account serialization, before and after the orjson path.
+
+Builds 5,000 in-memory accounts and times the old ``json.loads(doc.to_json())``
+round trip (plus the response encode FastAPI did afterwards) against projecting
+the raw BSON dict and encoding it once with orjson. ``to_mongo()`` stands in for
+``as_pymongo()`` here so the benchmark needs no database.
+
+Run from the repository root:
+
+    python -m benchmarks.serialization
+"""
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from models.db.valorant import MongoAccountResponseModel, MongoImagesModel, MongoRankDetailsDataModel, \
+    MongoRankDetailsModel
+from utils.serialization import encode_accounts
+
+ACCOUNTS = 5000
+ROUNDS = 5
+IMAGE_URL = 'https://media.valorant-api.com/competitivetiers/03621f52-342b-cf4e-4f86-9350a49c6d04/21/smallicon.png'
+
+
+def make_account(index: int) -> MongoAccountResponseModel:
+    elo = random.randint(0, 2500)
+    images = MongoImagesModel(small=IMAGE_URL, large=IMAGE_URL, triangle_down=IMAGE_URL, triangle_up=IMAGE_URL)
+    data = MongoRankDetailsDataModel(
+        currenttier=3 + elo // 100, currenttierpatched='Ascendant 1', images=images, ranking_in_tier=elo % 100,
+        mmr_change_to_last_game=random.randint(-25, 25), elo=elo, name=f'player{index}', tag='LK1', old=False,
+        last_elo_change_timestamp=datetime.utcnow() - timedelta(days=random.randint(0, 60)),
+    )
+    return MongoAccountResponseModel(
+        puuid=f'puuid-{index}', name=f'player{index}', tag='LK1', region='ap', discord_id=10 ** 17 + index,
+        discord_username=f'player{index}', rank_details=MongoRankDetailsModel(status=200, data=data),
+    )
+
+
+def before(accounts):
+    response = []
+    for account in accounts:
+        item = json.loads(account.to_json())
+        item.pop('_id', None)
+        response.append(item)
+    return json.dumps(response).encode()
+
+
+def after(raw_accounts):
+    return encode_accounts(raw_accounts)
+
+
+def best_of(func, argument) -> float:
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        func(argument)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    random.seed(0)
+    accounts = [make_account(index) for index in range(ACCOUNTS)]
+    raw_accounts = [account.to_mongo().to_dict() for account in accounts]
+
+    before_seconds = best_of(before, accounts)
+    after_seconds = best_of(after, raw_accounts)
+    print(f"{ACCOUNTS} accounts, best of {ROUNDS} rounds")
+    print(f"json.loads(to_json()) + json.dumps : {before_seconds * 1e6 / ACCOUNTS:8.2f} us/doc")
+    print(f"raw projection + orjson            : {after_seconds * 1e6 / ACCOUNTS:8.2f} us/doc")
+    print(f"speedup                            : {before_seconds / after_seconds:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
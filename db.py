@@ -1,9 +1,18 @@
-import mongoengine
+import asyncio
+import functools
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+import mongoengine
 
 MONGO_PASSWORD = os.getenv('MONGO_PASSWORD')
 MONGO_HOST = os.getenv('MONGO_HOST')
 MONGO_USERNAME = os.getenv('MONGO_USERNAME')
+MONGO_EXECUTOR_WORKERS = int(os.getenv('MONGO_EXECUTOR_WORKERS', 8))
+
+# mongoengine is synchronous, so every DB round trip runs here instead of on the event loop
+db_executor = ThreadPoolExecutor(max_workers=MONGO_EXECUTOR_WORKERS, thread_name_prefix='mongo')
+
 
 def connect_db():
     mongoengine.connect(host=f"mongodb+srv://{MONGO_USERNAME}:{MONGO_PASSWORD}@{MONGO_HOST}?retryWrites=true&w=majority")
@@ -11,3 +20,8 @@ def connect_db():
 
 def disconnect_db():
     mongoengine.disconnect()
+
+
+async def run_db(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(func, *args, **kwargs))
@@ -31,7 +31,17 @@ class MongoRankDetailsModel(EmbeddedDocument):
 
 
 class MongoAccountResponseModel(Document):
-    meta = {'collection': 'user_leaderboard_complete'}
+    meta = {
+        'collection': 'user_leaderboard_complete',
+        'indexes': [
+            # Leaderboard queries sort by (elo, puuid) keyset and filter on the last elo change timestamp
+            {
+                'fields': ['-rank_details.data.elo', 'puuid', 'rank_details.data.last_elo_change_timestamp'],
+                'name': 'leaderboard_elo_puuid_last_change',
+            },
+            {'fields': ['discord_id'], 'name': 'discord_id'},
+        ],
+    }
     puuid = StringField(required=True, unique=True)
     name = StringField(required=True)
     tag = StringField(required=True)
@@ -39,3 +49,6 @@ class MongoAccountResponseModel(Document):
     discord_id = IntField(required=True)
     discord_username = StringField(required=True, unique=True)
     rank_details = EmbeddedDocumentField(MongoRankDetailsModel)
+    # Refresh watermarks: latest mmr-history date_raw seen and a hash of the last stored rank payload
+    last_mmr_history_date_raw = IntField()
+    rank_payload_hash = StringField()
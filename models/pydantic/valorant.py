@@ -42,4 +42,10 @@ class SavedAccountResponseModel(BaseModel):
     region: str
     rank_details: RankDetailsModel
     discord_id: int
-    discord_username: str
\ No newline at end of file
+    discord_username: str
+
+
+class DiscordBindingUpdateModel(BaseModel):
+    discord_id_old: int
+    discord_id_new: int
+    discord_username_new: str
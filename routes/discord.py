@@ -1,12 +1,11 @@
-import json
 import os
 
 from fastapi import APIRouter, Depends, Request
-from fastapi.responses import JSONResponse
 from fastapi.responses import RedirectResponse
 from fastapi_discord import DiscordOAuthClient, User
 
-from models.db.valorant import MongoAccountResponseModel
+from services.accounts import find_account_documents_by_discord_id
+from utils.serialization import FastJSONResponse, encode_accounts
 
 # Load Discord OAuth2 Configuration from environment variables
 DISCORD_CLIENT_ID = os.getenv('DISCORD_CLIENT_ID')
@@ -53,9 +52,7 @@ async def get_user(user: User = Depends(discord.user)):
 
 @discord_router.get("/{discord_id}")
 async def get_discord_user(discord_id: int):
-    user = MongoAccountResponseModel.objects(
-        discord_id=discord_id
-    )
+    user = await find_account_documents_by_discord_id(discord_id)
     if user:
-        return JSONResponse(content=json.loads(user.to_json()))
+        return FastJSONResponse(content=encode_accounts(user))
     return None
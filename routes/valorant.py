@@ -1,326 +1,369 @@
-import json
-import os
-import time
-from typing import List
+import asyncio
+from typing import AsyncIterator, Callable, Dict, List, Literal, Optional, Tuple
 
-import aiohttp
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import JSONResponse
-from utils.misc import fetch_json
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from mongoengine import NotUniqueError
 
 from models.db.valorant import MongoImagesModel, MongoRankDetailsDataModel, MongoRankDetailsModel, \
     MongoAccountResponseModel
-from models.pydantic.valorant import AccountResponseModel, SavedAccountResponseModel
-
-API_TOKEN = os.getenv('HENRIK_API_TOKEN')
-API_BASE_URL = "https://api.henrikdev.xyz"
-
-if not API_TOKEN:
-    raise EnvironmentError("HENRIK_API_TOKEN environment variable not set")
+from models.pydantic.valorant import AccountResponseModel, DiscordBindingUpdateModel, SavedAccountResponseModel
+from services.accounts import find_registration_conflicts, get_account_by_discord_id, get_account_document, \
+    get_accounts_by_discord_ids, get_all_accounts, get_all_puuids, get_leaderboard_page, \
+    get_ranked_discord_documents, get_ranked_documents, iter_ranked_document_batches, save_account, \
+    update_discord_bindings
+from services.leaderboard import LEADERBOARD_ACTIVE_DAYS, InvalidCursor, decode_cursor, discord_columns, \
+    encode_cursor, leaderboard
+from services.valorant import AccountNotFound, refresh_account, refresh_account_rank
+from services.write_batcher import account_writes
+from utils.change_feed import account_changes, discord_id_change
+from utils.discord_dispatcher import member_sync_queue
+from utils.henrik import henrik
+from utils.rate_limit import BACKGROUND, INTERACTIVE
+from utils.refresh_scheduler import refresh_scheduler
+from utils.serialization import FastJSONResponse, document_to_account, dumps, encode_accounts, project_account
 
 valorant = APIRouter(prefix="/valorant", tags=["valorant"])
 
 
 @valorant.get("/rank/{puuid}", response_model=AccountResponseModel)
 async def get_rank_details(puuid: str):
-    async with aiohttp.ClientSession() as session:
-        headers_henrik = {
-            'Authorization': f'{API_TOKEN}'
-        }
+    try:
+        acc_details_json = await henrik.get_json_cached(f'/valorant/v1/by-puuid/account/{puuid}')
+        acc_region = acc_details_json['data']['region']
+        acc_name = acc_details_json['data']['name']
+        acc_tag = acc_details_json['data']['tag']
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Exception: {e}")
 
-        try:
-            account_url = f'{API_BASE_URL}/valorant/v1/by-puuid/account/{puuid}'
-            acc_details_json = await fetch_json(session, account_url, headers_henrik)
-            acc_region = acc_details_json['data']['region']
-            acc_name = acc_details_json['data']['name']
-            acc_tag = acc_details_json['data']['tag']
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Exception: {e}")
+    try:
+        rank_details_json = await henrik.get_json_cached(f'/valorant/v3/by-puuid/mmr/{acc_region}/pc/{puuid}')
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Exception: {e}")
 
-        try:
-            rank_url = f'{API_BASE_URL}/valorant/v3/by-puuid/mmr/{acc_region}/pc/{puuid}'
-            rank_details_json = await fetch_json(session, rank_url, headers_henrik)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Exception: {e}")
+    return {
+        "puuid": puuid,
+        "name": acc_name,
+        "tag": acc_tag,
+        "region": acc_region,
+        "rank_details": rank_details_json
+    }
+
+
+def _discard(task: asyncio.Task):
+    task.cancel()
+    # Retrieve a failure that finished before the cancel so it isn't reported as never retrieved
+    task.add_done_callback(lambda done: done.cancelled() or done.exception())
 
-        return {
-            "puuid": puuid,
-            "name": acc_name,
-            "tag": acc_tag,
-            "region": acc_region,
-            "rank_details": rank_details_json
-        }
+
+def _registration_conflict(conflicts: List[Dict], puuid: str, discord_id: int, discord_username: str) -> Optional[str]:
+    if any(account['puuid'] == puuid for account in conflicts):
+        return "Riot account already exists in the database."
+    if discord_id != 0 and any(account['discord_id'] == discord_id for account in conflicts):
+        return "Discord ID already exists in the database."
+    if any(account['discord_username'] == discord_username for account in conflicts):
+        return "Discord username already exists in the database."
+    return None
 
 
 @valorant.post("/rank/{puuid}/{discord_id}/{discord_username}/", response_model=SavedAccountResponseModel)
 async def save_rank_details(puuid: str,
                             discord_id: int,
                             discord_username: str):
-    # check if the puuid is already in the database
-    if MongoAccountResponseModel.objects(puuid=puuid):
-        raise HTTPException(status_code=400, detail="Riot account already exists in the database.")
+    # The Henrik account lookup doesn't depend on the conflict check, so it runs alongside it
+    acc_details_task = asyncio.create_task(henrik.get_json_cached(f'/valorant/v1/by-puuid/account/{puuid}'))
+    try:
+        conflicts = await find_registration_conflicts(puuid, discord_id, discord_username)
+    except BaseException:
+        _discard(acc_details_task)
+        raise
 
-    # check if the discord_id is already in the database
+    # check if the puuid, discord_id or discord_username is already in the database
+    conflict_detail = _registration_conflict(conflicts, puuid, discord_id, discord_username)
+    if conflict_detail:
+        _discard(acc_details_task)
+        raise HTTPException(status_code=400, detail=conflict_detail)
 
-    if discord_id != 0:
-        if MongoAccountResponseModel.objects(discord_id=discord_id):
-            raise HTTPException(status_code=400, detail="Discord ID already exists in the database.")
+    try:
+        acc_details_json = await acc_details_task
+        acc_region = acc_details_json['data']['region']
+        acc_name = acc_details_json['data']['name']
+        acc_tag = acc_details_json['data']['tag']
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Exception: {e}")
 
-    # check if the discord_username is already in the database
-    if MongoAccountResponseModel.objects(discord_username=discord_username):
-        raise HTTPException(status_code=400, detail="Discord username already exists in the database.")
+    try:
+        rank_details_json = await henrik.get_json_cached(f'/valorant/v1/by-puuid/mmr/{acc_region}/{puuid}')
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Exception: {e}")
 
-    async with aiohttp.ClientSession() as session:
-        headers_henrik = {
-            'Authorization': f'{API_TOKEN}'
-        }
+    # Extract and construct the embedded document models
+    images_data = rank_details_json['data'].pop('images')
+    images = MongoImagesModel(**images_data)
+    rank_details_data = MongoRankDetailsDataModel(images=images, **rank_details_json['data'])
+    rank_details = MongoRankDetailsModel(status=rank_details_json['status'], data=rank_details_data)
+
+    # Construct the main document model
+    account_response = MongoAccountResponseModel(
+        puuid=puuid,
+        name=acc_name,
+        tag=acc_tag,
+        region=acc_region,
+        rank_details=rank_details,
+        discord_id=discord_id,
+        discord_username=discord_username,
+    )
+
+    # Save to database; the unique indexes catch registrations racing past the conflict check
+    try:
+        await save_account(account_response)
+    except NotUniqueError as e:
+        detail = "Discord username already exists in the database." if 'discord_username' in str(e) \
+            else "Riot account already exists in the database."
+        raise HTTPException(status_code=400, detail=detail)
+    except Exception as e:
+        print(e)
+        raise HTTPException(status_code=500, detail=f"Failed to save data to the database: {e}")
 
-        try:
-            account_url = f'{API_BASE_URL}/valorant/v1/by-puuid/account/{puuid}'
-            acc_details_json = await fetch_json(session, account_url, headers_henrik)
-            acc_region = acc_details_json['data']['region']
-            acc_name = acc_details_json['data']['name']
-            acc_tag = acc_details_json['data']['tag']
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Exception: {e}")
+    leaderboard.upsert(account_response)
+    _publish_discord_id(discord_id)
 
-        try:
-            rank_url = f'{API_BASE_URL}/valorant/v1/by-puuid/mmr/{acc_region}/{puuid}'
-            rank_details_json = await fetch_json(session, rank_url, headers_henrik)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Exception: {e}")
+    # Refresh the new player right away to fill in the mmr-history based fields
+    refresh_scheduler.schedule_now(puuid, urgent=True)
 
-        # Extract and construct the embedded document models
-        images_data = rank_details_json['data'].pop('images')
-        images = MongoImagesModel(**images_data)
-        rank_details_data = MongoRankDetailsDataModel(images=images, **rank_details_json['data'])
-        rank_details = MongoRankDetailsModel(status=rank_details_json['status'], data=rank_details_data)
-
-        # Construct the main document model
-        account_response = MongoAccountResponseModel(
-            puuid=puuid,
-            name=acc_name,
-            tag=acc_tag,
-            region=acc_region,
-            rank_details=rank_details,
-            discord_id=discord_id,
-            discord_username=discord_username,
-        )
-
-        # Save to database
-        try:
-            account_response.save()
-        except Exception as e:
-            print(e)
-            raise HTTPException(status_code=500, detail=f"Failed to save data to the database: {e}")
+    # Return the response model
+    return FastJSONResponse(content=document_to_account(account_response))
+
+
+def _snapshot_cache_headers(request: Request) -> Tuple[Dict[str, str], bool]:
+    """ETag headers for a snapshot-backed response and whether the client already has it."""
+    etag = leaderboard.etag(f"{request.url.path}?{request.url.query}")
+    if_none_match = request.headers.get('if-none-match', '')
+    # If-None-Match uses the weak comparison, so W/"x" and "x" both match
+    tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    not_modified = etag.removeprefix('W/') in tags or '*' in tags
+    # no-cache lets clients store the response but makes them revalidate it with the ETag
+    return {"ETag": etag, "Cache-Control": "no-cache"}, not_modified
 
-        # Return the response model
-        account_response_json = json.loads(account_response.to_json())
-        account_response_json.pop('_id')
 
-        return account_response_json
+def _leaderboard_headers(total_count: int, next_cursor: Optional[str]) -> Dict[str, str]:
+    headers = {"X-Total-Count": str(total_count)}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+    return headers
 
 
 @valorant.get("/leaderboard", response_model=List[SavedAccountResponseModel])
 async def get_leaderboard(
+        request: Request,
         page: int = Query(1, ge=1),
-        page_size: int = Query(10, ge=1, le=100)
+        page_size: int = Query(10, ge=1, le=100),
+        cursor: Optional[str] = Query(None, description="Opaque X-Next-Cursor from the previous page")
 ):
     try:
+        if leaderboard.ready:
+            # Served from the in-memory snapshot, which is patched on every rank write
+            cache_headers, not_modified = _snapshot_cache_headers(request)
+            if not_modified:
+                return Response(status_code=304, headers=cache_headers)
+            total_count, response, next_cursor = leaderboard.page(page, page_size, cursor)
+            return FastJSONResponse(content=response,
+                                    headers={**_leaderboard_headers(total_count, next_cursor), **cache_headers})
+
         # Calculate pagination offset
         skip = (page - 1) * page_size
+        after = None
+        if cursor is not None:
+            negative_elo, puuid = decode_cursor(cursor)
+            after = (-negative_elo, puuid)
 
         # Calculate the cutoff datetime (45 days ago)
-        cutoff_date = datetime.utcnow() - timedelta(days=45)
+        cutoff_date = datetime.utcnow() - timedelta(days=LEADERBOARD_ACTIVE_DAYS)
 
         # Query the database with sorting, pagination, and filtering for accounts updated within 45 days
-        total_count = MongoAccountResponseModel.objects(
-            rank_details__data__elo__ne=0,
-            rank_details__data__elo__exists=True,
-            rank_details__data__last_elo_change_timestamp__gte=cutoff_date
-        ).count()
-
-        leaderboard = MongoAccountResponseModel.objects(
-            rank_details__data__elo__ne=0,
-            rank_details__data__elo__exists=True,
-            rank_details__data__last_elo_change_timestamp__gte=cutoff_date
-        ).order_by('-rank_details.data.elo').skip(skip).limit(page_size)
-
-        response = []
-        for account in leaderboard:
-            item = json.loads(account.to_json())
-            item.pop('_id')
-            response.append(item)
-
-        return JSONResponse(content=response, headers={"X-Total-Count": str(total_count)})
+        total_count, accounts = await get_leaderboard_page(cutoff_date, skip, page_size, after=after)
+
+        next_cursor = None
+        if len(accounts) == page_size and (after is not None or skip + page_size < total_count):
+            last = accounts[-1]
+            next_cursor = encode_cursor((-last['rank_details']['data']['elo'], last['puuid']))
+
+        return FastJSONResponse(content=encode_accounts(accounts),
+                                headers=_leaderboard_headers(total_count, next_cursor))
 
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid leaderboard cursor.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Exception: {e}")
 
 
+NDJSON_BATCH_SIZE = 500
+
+
+async def _ndjson_from_snapshot(encoded_accounts: List[bytes]) -> AsyncIterator[bytes]:
+    for start in range(0, len(encoded_accounts), NDJSON_BATCH_SIZE):
+        yield b''.join(item + b'\n' for item in encoded_accounts[start:start + NDJSON_BATCH_SIZE])
+
+
+async def _ndjson_from_db() -> AsyncIterator[bytes]:
+    async for batch in iter_ranked_document_batches(NDJSON_BATCH_SIZE):
+        yield b''.join(dumps(project_account(document)) + b'\n' for document in batch)
+
+
+def _position_response(request: Request, position: Callable[[], Optional[Dict]]):
+    if not leaderboard.ready:
+        raise HTTPException(status_code=503, detail="Leaderboard is still loading.")
+    cache_headers, not_modified = _snapshot_cache_headers(request)
+    if not_modified:
+        return Response(status_code=304, headers=cache_headers)
+    result = position()
+    if result is None:
+        raise HTTPException(status_code=404, detail="Player is not on the leaderboard.")
+    return FastJSONResponse(content=result, headers=cache_headers)
+
+
+@valorant.get("/leaderboard/distribution")
+async def get_rank_distribution(request: Request):
+    """Tier counts, elo percentiles and per-region tier counts of every ranked account."""
+    if not leaderboard.ready:
+        raise HTTPException(status_code=503, detail="Leaderboard is still loading.")
+    cache_headers, not_modified = _snapshot_cache_headers(request)
+    if not_modified:
+        return Response(status_code=304, headers=cache_headers)
+    return FastJSONResponse(content=leaderboard.distribution.summary(), headers=cache_headers)
+
+
+@valorant.get("/leaderboard/position/discord/{discord_id}")
+async def get_leaderboard_position_by_discord_id(request: Request, discord_id: int,
+                                                 neighbors: int = Query(2, ge=0, le=10)):
+    if discord_id == 0:
+        raise HTTPException(status_code=404, detail="Player is not on the leaderboard.")
+    return _position_response(request, lambda: leaderboard.position_by_discord_id(discord_id, neighbors))
+
+
+@valorant.get("/leaderboard/position/{puuid}")
+async def get_leaderboard_position(request: Request, puuid: str, neighbors: int = Query(2, ge=0, le=10)):
+    return _position_response(request, lambda: leaderboard.position(puuid, neighbors))
+
 
 @valorant.get("/leaderboard/all", response_model=List[SavedAccountResponseModel])
-async def get_all_leaderboard():
+async def get_all_leaderboard(request: Request, format: Literal['json', 'ndjson'] = Query('json')):
     try:
-        leaderboard = MongoAccountResponseModel.objects(
-            rank_details__data__elo__ne=0,
-            rank_details__data__elo__exists=True
-        ).order_by('-rank_details.data.elo')
+        if leaderboard.ready:
+            cache_headers, not_modified = _snapshot_cache_headers(request)
+            if not_modified:
+                return Response(status_code=304, headers=cache_headers)
+            if format == 'ndjson':
+                # One account per line, streamed so consumers can start before the last one is sent
+                return StreamingResponse(_ndjson_from_snapshot(leaderboard.encoded_accounts()),
+                                         media_type="application/x-ndjson", headers=cache_headers)
+            return FastJSONResponse(content=leaderboard.all(), headers=cache_headers)
 
-        response = []
-        for account in leaderboard:
-            item = json.loads(account.to_json())
-            item.pop('_id')
-            response.append(item)
+        if format == 'ndjson':
+            return StreamingResponse(_ndjson_from_db(), media_type="application/x-ndjson")
 
-        return response
+        return FastJSONResponse(content=encode_accounts(await get_ranked_documents()))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Exception: {e}")
 
 
 
-from datetime import datetime, timedelta
-
-@valorant.put("/update-all", response_model=List[SavedAccountResponseModel])
-async def update_all_accounts():
-    async with aiohttp.ClientSession() as session:
-        headers_henrik = {'Authorization': f'{API_TOKEN}'}
+@valorant.get("/leaderboard/discord")
+async def get_discord_leaderboard(request: Request):
+    """Compact, columnar view of the ranked accounts for the Discord bots' role sync."""
+    try:
+        if leaderboard.ready:
+            cache_headers, not_modified = _snapshot_cache_headers(request)
+            if not_modified:
+                return Response(status_code=304, headers=cache_headers)
+            return FastJSONResponse(content=leaderboard.discord_columns(), headers=cache_headers)
 
-        try:
-            accounts = MongoAccountResponseModel.objects()
-            updated_accounts = []
-
-            for account in accounts:
-                puuid = account.puuid
-                account_url = f'{API_BASE_URL}/valorant/v1/by-puuid/account/{puuid}'
-                rank_url = f'{API_BASE_URL}/valorant/v1/by-puuid/mmr/{account.region}/{puuid}'
-                mmr_history_url = f'{API_BASE_URL}/valorant/v1/by-puuid/mmr-history/{account.region}/{puuid}'
-
-                try:
-                    acc_details_json = await fetch_json(session, account_url, headers_henrik)
-                    rank_details_json = await fetch_json(session, rank_url, headers_henrik)
-                    mmr_history_json = await fetch_json(session, mmr_history_url, headers_henrik)
-
-                    # Update account details
-                    account.name = acc_details_json['data']['name']
-                    account.tag = acc_details_json['data']['tag']
-
-                    # Process rank details from the mmr endpoint
-                    data = rank_details_json['data']
-                    images_data = data.pop('images')
-                    images = MongoImagesModel(**images_data)
-
-                    # Use the mmr-history endpoint to set the last elo change timestamp:
-                    if mmr_history_json.get('data') and len(mmr_history_json['data']) > 0:
-                        first_item = mmr_history_json['data'][0]
-                        date_raw = first_item.get('date_raw')
-                        if date_raw is not None:
-                            last_change_dt = datetime.utcfromtimestamp(date_raw)
-                        else:
-                            last_change_dt = datetime.utcnow()
-                    else:
-                        last_change_dt = datetime.utcnow()
-
-                    data['last_elo_change_timestamp'] = last_change_dt
-
-                    rank_details_data = MongoRankDetailsDataModel(images=images, **data)
-                    rank_details = MongoRankDetailsModel(status=rank_details_json['status'], data=rank_details_data)
-                    account.rank_details = rank_details
-
-                    account.save()
-                    print(f"Successfully updated account with PUUID: {puuid}")
-
-                    account_response_json = json.loads(account.to_json())
-                    account_response_json.pop('_id')
-                    updated_accounts.append(account_response_json)
-                    time.sleep(2.5)
-                except Exception as e:
-                    print(f"Failed to update account with PUUID {puuid}: {e}")
-
-            return updated_accounts
+        return FastJSONResponse(content=discord_columns(await get_ranked_discord_documents()))
 
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Exception: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Exception: {e}")
 
 
-@valorant.put("/update/rank/{puuid}", response_model=SavedAccountResponseModel)
-async def update_account_rank(puuid: str):
-    async with aiohttp.ClientSession() as session:
-        headers_henrik = {'Authorization': f'{API_TOKEN}'}
+from datetime import datetime, timedelta
 
-        try:
-            account = MongoAccountResponseModel.objects(puuid=puuid).first()
-            if not account:
-                raise HTTPException(status_code=404, detail="Account not found")
+@valorant.put("/update-all", response_model=List[SavedAccountResponseModel])
+async def update_all_accounts():
+    try:
+        accounts = await get_all_accounts()
+        updated_accounts = []
+        failed_writes = {}
 
-            account_url = f'{API_BASE_URL}/valorant/v1/by-puuid/account/{puuid}'
-            rank_url = f'{API_BASE_URL}/valorant/v1/by-puuid/mmr/{account.region}/{puuid}'
-            mmr_history_url = f'{API_BASE_URL}/valorant/v1/by-puuid/mmr-history/{account.region}/{puuid}'
+        def written(puuid, error):
+            if error is not None:
+                failed_writes[puuid] = error
 
+        for account in accounts:
+            puuid = account.puuid
             try:
-                acc_details_json = await fetch_json(session, account_url, headers_henrik)
-                rank_details_json = await fetch_json(session, rank_url, headers_henrik)
-                mmr_history_json = await fetch_json(session, mmr_history_url, headers_henrik)
+                # Writes are batched and flushed together below
+                await refresh_account(account, lane=BACKGROUND, on_written=written)
+                updated_accounts.append(account)
+            except Exception as e:
+                print(f"Failed to update account with PUUID {puuid}: {e}")
 
-                # Update account details
-                account.name = acc_details_json['data']['name']
-                account.tag = acc_details_json['data']['tag']
+        await account_writes.flush()
+        for puuid, error in failed_writes.items():
+            print(f"Failed to update account with PUUID {puuid}: {error}")
+        print(f"Successfully updated {len(updated_accounts) - len(failed_writes)} accounts")
 
-                data = rank_details_json['data']
-                images_data = data.pop('images')
-                images = MongoImagesModel(**images_data)
+        return FastJSONResponse(content=[document_to_account(account) for account in updated_accounts
+                                         if account.puuid not in failed_writes])
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Exception: {e}")
 
-                # Set the last elo change timestamp using the mmr-history endpoint:
-                if mmr_history_json.get('data') and len(mmr_history_json['data']) > 0:
-                    first_item = mmr_history_json['data'][0]
-                    date_raw = first_item.get('date_raw')
-                    if date_raw is not None:
-                        last_change_dt = datetime.utcfromtimestamp(date_raw)
-                    else:
-                        last_change_dt = datetime.utcnow()
-                else:
-                    last_change_dt = datetime.utcnow()
 
-                data['last_elo_change_timestamp'] = last_change_dt
+@valorant.put("/update/rank/{puuid}", response_model=SavedAccountResponseModel)
+async def update_account_rank(puuid: str, queue: bool = Query(False)):
+    if queue:
+        try:
+            account = await get_account_document(puuid)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Exception: {e}")
+        if not account:
+            raise HTTPException(status_code=404, detail="Account not found")
+        # Hand the refresh to the background scheduler, ahead of every regular entry
+        refresh_scheduler.schedule_now(puuid, urgent=True)
+        return JSONResponse(status_code=202, content={"puuid": puuid, **refresh_scheduler.stats()})
 
-                rank_details_data = MongoRankDetailsDataModel(images=images, **data)
-                rank_details = MongoRankDetailsModel(status=rank_details_json['status'], data=rank_details_data)
-                account.rank_details = rank_details
+    try:
+        account = await refresh_account_rank(puuid, lane=INTERACTIVE)
+    except AccountNotFound:
+        raise HTTPException(status_code=404, detail="Account not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to update account: {e}")
 
-                account.save()
+    return FastJSONResponse(content=document_to_account(account))
 
-                account_response_json = json.loads(account.to_json())
-                account_response_json.pop('_id')
-                return account_response_json
 
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Failed to update account: {e}")
+@valorant.get("/refresh/metrics")
+async def get_refresh_metrics():
+    return {**refresh_scheduler.stats(), "henrik_cache": henrik.cache.stats(), "writes": account_writes.stats(),
+            "discord_sync": member_sync_queue.stats()}
 
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Exception: {e}")
 
 @valorant.get("/account/{puuid}", response_model=SavedAccountResponseModel)
 async def get_account(puuid: str):
     try:
-        account = MongoAccountResponseModel.objects(puuid=puuid).first()
-        if not account:
-            raise HTTPException(status_code=404, detail="Account not found in the database.")
-
-        account_json = json.loads(account.to_json())
-        account_json.pop('_id')
-        return account_json
-
+        account = await get_account_document(puuid)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Exception: {e}")
 
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found in the database.")
+    return FastJSONResponse(content=project_account(account))
+
 
 @valorant.get("/account/all/puuids", response_model=List[str])
 async def get_all_accounts_puuid_list():
     try:
-        accounts = MongoAccountResponseModel.objects()
-        puuid_list = [account.puuid for account in accounts]
-        return puuid_list
+        return await get_all_puuids()
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Exception: {e}")
@@ -329,20 +372,47 @@ async def get_all_accounts_puuid_list():
 
 
 
+def _publish_discord_id(discord_id: int):
+    # A member's roles follow their best ranked linked account; with none left they fall back to unverified
+    if discord_id != 0:
+        account_changes.publish(discord_id_change(discord_id, leaderboard.discord_account(discord_id)))
+
+
 @valorant.put("/update/discord/{discord_id_old}/{discord_id_new}/{discord_username_new}",
               response_model=SavedAccountResponseModel)
 async def update_account_discord(discord_id_new: int,
                                  discord_username_new: str,
                                  discord_id_old: int):
-    account = MongoAccountResponseModel.objects(discord_id=discord_id_old).first()
+    account = await get_account_by_discord_id(discord_id_old)
     if not account:
         raise HTTPException(status_code=404, detail="Account not found in the database.")
     try:
         account.discord_id = discord_id_new
         account.discord_username = discord_username_new
-        account.save()
-        account_json = json.loads(account.to_json())
-        account_json.pop('_id')
-        return account_json
+        await save_account(account)
+        leaderboard.upsert(account)
+        if discord_id_new != discord_id_old:
+            _publish_discord_id(discord_id_new)
+            _publish_discord_id(discord_id_old)
+        return FastJSONResponse(content=document_to_account(account))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Exception: {e}")
+
+
+@valorant.put("/update/discord/batch")
+async def update_accounts_discord(updates: List[DiscordBindingUpdateModel]):
+    if not updates:
+        return {"matched": 0, "modified": 0, "errors": []}
+    try:
+        result = await update_discord_bindings(
+            [(update.discord_id_old, update.discord_id_new, update.discord_username_new) for update in updates])
+        if result["modified"]:
+            for account in await get_accounts_by_discord_ids(list({update.discord_id_new for update in updates})):
+                leaderboard.upsert(account)
+            # One change per affected member, published once every rebound account is in the snapshot
+            moved = [update for update in updates if update.discord_id_new != update.discord_id_old]
+            for discord_id in {update.discord_id_new for update in moved} | {update.discord_id_old for update in moved}:
+                _publish_discord_id(discord_id)
+        return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Exception: {e}")
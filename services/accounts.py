@@ -0,0 +1,206 @@
+"""Async data access for ``MongoAccountResponseModel``.
+
+Every query is materialized inside the DB thread pool (see ``db.run_db``) so no
+mongoengine call ever blocks the event loop shared by the API, the background
+updater and the Discord bots. Read-only paths return raw documents projected to
+the public account fields (``as_pymongo()``) rather than ``Document`` instances.
+"""
+import json
+import logging
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from mongoengine import Q
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from db import run_db
+from models.db.valorant import MongoAccountResponseModel
+from utils.serialization import ACCOUNT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Accounts updated within this many days make up the leaderboard
+LEADERBOARD_ACTIVE_DAYS = 45
+
+
+def _ranked_accounts():
+    return MongoAccountResponseModel.objects(
+        rank_details__data__elo__ne=0,
+        rank_details__data__elo__exists=True
+    )
+
+
+def _active_ranked_accounts(cutoff_date: datetime):
+    return MongoAccountResponseModel.objects(
+        rank_details__data__elo__ne=0,
+        rank_details__data__elo__exists=True,
+        rank_details__data__last_elo_change_timestamp__gte=cutoff_date
+    )
+
+
+async def get_account(puuid: str) -> Optional[MongoAccountResponseModel]:
+    return await run_db(lambda: MongoAccountResponseModel.objects(puuid=puuid).first())
+
+
+async def get_account_by_discord_id(discord_id: int) -> Optional[MongoAccountResponseModel]:
+    return await run_db(lambda: MongoAccountResponseModel.objects(discord_id=discord_id).first())
+
+
+def _documents(queryset):
+    return queryset.only(*ACCOUNT_FIELDS).as_pymongo()
+
+
+async def get_account_document(puuid: str) -> Optional[Dict[str, Any]]:
+    return await run_db(lambda: _documents(MongoAccountResponseModel.objects(puuid=puuid)).first())
+
+
+async def find_account_documents_by_discord_id(discord_id: int) -> List[Dict[str, Any]]:
+    return await run_db(lambda: list(_documents(MongoAccountResponseModel.objects(discord_id=discord_id))))
+
+
+async def find_registration_conflicts(puuid: str, discord_id: int, discord_username: str) -> List[Dict[str, Any]]:
+    """Accounts already holding this puuid, discord_username or (non-zero) discord_id, in one query."""
+    def query():
+        conflict = Q(puuid=puuid) | Q(discord_username=discord_username)
+        if discord_id != 0:
+            conflict |= Q(discord_id=discord_id)
+        accounts = MongoAccountResponseModel.objects(conflict).only('puuid', 'discord_id', 'discord_username')
+        # No limit: discord_id isn't unique, so several id matches could crowd out the puuid or username one
+        return list(accounts.as_pymongo())
+
+    return await run_db(query)
+
+
+async def save_account(account: MongoAccountResponseModel) -> MongoAccountResponseModel:
+    return await run_db(account.save)
+
+
+async def update_discord_bindings(updates: List[Tuple[int, int, str]]) -> Dict[str, Any]:
+    """Apply (old discord_id, new discord_id, new username) corrections in one unordered bulk write.
+
+    Per-update failures (e.g. a username already taken) don't stop the rest of
+    the batch; they come back in ``errors`` with the index of the update.
+    """
+    def write():
+        operations = [UpdateOne({'discord_id': old_id},
+                                {'$set': {'discord_id': new_id, 'discord_username': username}})
+                      for old_id, new_id, username in updates]
+        try:
+            result = MongoAccountResponseModel._get_collection().bulk_write(operations, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+        errors = [{"index": error['index'], "detail": error['errmsg']} for error in details.get('writeErrors', [])]
+        return {"matched": details['nMatched'], "modified": details['nModified'], "errors": errors}
+
+    return await run_db(write)
+
+
+async def bulk_write_accounts(operations: List[Any]):
+    """Run pymongo write operations as one unordered bulk write; raises ``BulkWriteError`` on per-op errors."""
+    return await run_db(lambda: MongoAccountResponseModel._get_collection().bulk_write(operations, ordered=False))
+
+
+async def get_accounts_by_discord_ids(discord_ids: List[int]) -> List[MongoAccountResponseModel]:
+    return await run_db(lambda: list(MongoAccountResponseModel.objects(discord_id__in=discord_ids)))
+
+
+async def get_all_accounts() -> List[MongoAccountResponseModel]:
+    return await run_db(lambda: list(MongoAccountResponseModel.objects()))
+
+
+async def get_all_puuids() -> List[str]:
+    return await run_db(lambda: [account.puuid for account in MongoAccountResponseModel.objects().only('puuid')])
+
+
+async def get_top_puuids(limit: int) -> List[str]:
+    def query():
+        accounts = _ranked_accounts().order_by('-rank_details.data.elo').only('puuid').limit(limit)
+        return [account.puuid for account in accounts]
+
+    return await run_db(query)
+
+
+async def get_ranked_documents() -> List[Dict[str, Any]]:
+    return await run_db(lambda: list(_documents(_ranked_accounts().order_by('-rank_details.data.elo'))))
+
+
+async def iter_ranked_document_batches(batch_size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Yield ranked account documents in elo order, ``batch_size`` at a time from one cursor."""
+    # no_cache() so the queryset doesn't keep every document it has already yielded
+    cursor = iter(_documents(_ranked_accounts().order_by('-rank_details.data.elo').batch_size(batch_size)).no_cache())
+    while True:
+        batch = await run_db(lambda: list(islice(cursor, batch_size)))
+        if not batch:
+            return
+        yield batch
+
+
+async def get_ranked_discord_documents() -> List[Dict[str, Any]]:
+    """Ranked accounts projected to just the fields the Discord bots use."""
+    def query():
+        accounts = _ranked_accounts().order_by('-rank_details.data.elo')
+        return list(accounts.only('discord_id', 'discord_username', 'rank_details.data.currenttierpatched').as_pymongo())
+
+    return await run_db(query)
+
+
+async def map_ranked_documents(func: Callable[[Dict[str, Any]], Any]) -> List[Any]:
+    """Apply ``func`` to every ranked account document inside the DB thread pool."""
+    return await run_db(lambda: [func(document) for document in _documents(_ranked_accounts())])
+
+
+async def get_leaderboard_page(cutoff_date: datetime, skip: int, limit: int,
+                               after: Optional[Tuple[int, str]] = None) -> Tuple[int, List[Dict[str, Any]]]:
+    """Return the total count and one page of the active leaderboard.
+
+    ``after`` is an (elo, puuid) keyset position; when given the page starts
+    right after it instead of skipping ``skip`` documents.
+    """
+    def query():
+        total_count = _active_ranked_accounts(cutoff_date).count()
+        accounts = _active_ranked_accounts(cutoff_date).order_by('-rank_details.data.elo', '+puuid')
+        if after is not None:
+            elo, puuid = after
+            accounts = accounts.filter(Q(rank_details__data__elo__lt=elo) |
+                                       Q(rank_details__data__elo=elo, puuid__gt=puuid))
+        else:
+            accounts = accounts.skip(skip)
+        return total_count, list(_documents(accounts.limit(limit)))
+
+    return await run_db(query)
+
+
+def _index_key(fields) -> tuple:
+    return tuple((field, int(direction)) for field, direction in fields)
+
+
+def _check_indexes():
+    MongoAccountResponseModel.ensure_indexes()
+
+    existing = MongoAccountResponseModel._get_collection().index_information()
+    existing_keys = {_index_key(info['key']) for info in existing.values()}
+    for fields in MongoAccountResponseModel.list_indexes():
+        if _index_key(fields) not in existing_keys:
+            logger.warning(f"Missing index on {MongoAccountResponseModel._meta['collection']}: {fields}")
+
+    leaderboard_queries = {
+        'leaderboard': _active_ranked_accounts(datetime.utcnow() - timedelta(days=LEADERBOARD_ACTIVE_DAYS))
+        .order_by('-rank_details.data.elo', '+puuid').limit(10),
+        'leaderboard_all': _ranked_accounts().order_by('-rank_details.data.elo'),
+        'discord_id': MongoAccountResponseModel.objects(discord_id=0),
+    }
+    for name, queryset in leaderboard_queries.items():
+        winning_plan = queryset.explain().get('queryPlanner', {}).get('winningPlan', {})
+        plan = json.dumps(winning_plan, default=str)
+        if 'COLLSCAN' in plan:
+            logger.warning(f"Query '{name}' uses a collection scan: {plan}")
+        else:
+            logger.info(f"Query '{name}' plan: {plan}")
+
+
+async def check_indexes():
+    """Create declared indexes, report any still missing and dump leaderboard query plans."""
+    await run_db(_check_indexes)
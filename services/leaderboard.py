@@ -0,0 +1,245 @@
+"""Materialized leaderboard held in memory.
+
+Ranked accounts are kept sorted by elo and patched whenever an account is
+written, so leaderboard reads are served as list slices without touching Mongo.
+Each account is encoded to JSON once when it enters the snapshot and pages are
+assembled from those bytes.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import uuid
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from models.db.valorant import MongoAccountResponseModel
+from services.accounts import LEADERBOARD_ACTIVE_DAYS, map_ranked_documents
+from services.rank_distribution import RankDistribution
+from utils.serialization import document_to_account, dumps, join_encoded, project_account
+
+logger = logging.getLogger(__name__)
+
+
+def discord_columns(documents: Iterable[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """The only fields the Discord bots need, as parallel arrays."""
+    columns = {'discord_id': [], 'discord_username': [], 'currenttierpatched': []}
+    for document in documents:
+        columns['discord_id'].append(document['discord_id'])
+        columns['discord_username'].append(document['discord_username'])
+        columns['currenttierpatched'].append(document['rank_details']['data'].get('currenttierpatched'))
+    return columns
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(key: tuple) -> str:
+    """Opaque keyset cursor for the (elo, puuid) position of the last item on a page."""
+    negative_elo, puuid = key
+    return base64.urlsafe_b64encode(json.dumps([-negative_elo, puuid]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        elo, puuid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    # Cursors only ever carry an integer elo; bool is an int subclass but never a valid one
+    if type(elo) is not int or not isinstance(puuid, str):
+        raise InvalidCursor(cursor)
+    return -elo, puuid
+
+
+def _row(document: Dict[str, Any]) -> Optional[Tuple[tuple, datetime, Dict[str, Any], bytes]]:
+    """Return (sort key, last elo change, account, encoded account) or None for unranked accounts."""
+    data = (document.get('rank_details') or {}).get('data') or {}
+    if not data.get('elo'):
+        return None
+    account = project_account(document)
+    return (-data['elo'], account['puuid']), data.get('last_elo_change_timestamp'), account, dumps(account)
+
+
+class LeaderboardSnapshot:
+    def __init__(self):
+        self.ready = False
+        # version only counts up within this process, so ETags also carry a per-process id
+        self.version = 0
+        self._instance = uuid.uuid4().hex[:8]
+        self._keys: List[tuple] = []
+        self._rows: List[Tuple[tuple, datetime, Dict[str, Any], bytes]] = []
+        self._by_puuid: Dict[str, tuple] = {}
+        self._puuids_by_discord_id: Dict[int, Set[str]] = {}
+        self._active: Optional[List[bytes]] = None
+        self._active_keys: List[tuple] = []
+        self._active_accounts: List[Dict[str, Any]] = []
+        self._active_expires_at: Optional[datetime] = None
+        self._discord_columns: Optional[Tuple[int, bytes]] = None
+        self.distribution = RankDistribution()
+        # Patches applied while a rebuild is loading, replayed on top of the rebuilt rows
+        self._pending: Optional[Dict[str, Optional[tuple]]] = None
+
+    def _invalidate(self):
+        self.version += 1
+        self._active = None
+
+    def _insert(self, puuid: str, row: Optional[tuple]):
+        key = self._by_puuid.pop(puuid, None)
+        if key is not None:
+            index = bisect_left(self._keys, key)
+            self._puuids_by_discord_id.get(self._rows[index][2].get('discord_id'), set()).discard(puuid)
+            del self._keys[index]
+            del self._rows[index]
+        if row is not None:
+            index = bisect_left(self._keys, row[0])
+            self._keys.insert(index, row[0])
+            self._rows.insert(index, row)
+            self._by_puuid[puuid] = row[0]
+            self._puuids_by_discord_id.setdefault(row[2].get('discord_id'), set()).add(puuid)
+        self.distribution.update(puuid, row[2] if row is not None else None)
+
+    def upsert(self, account: MongoAccountResponseModel):
+        row = _row(document_to_account(account))
+        if self._pending is not None:
+            self._pending[account.puuid] = row
+        self._insert(account.puuid, row)
+        self._invalidate()
+
+    def remove(self, puuid: str):
+        if self._pending is not None:
+            self._pending[puuid] = None
+        self._insert(puuid, None)
+        self._invalidate()
+
+    @staticmethod
+    def _signature(rows) -> List[tuple]:
+        return [(row[0], row[1], row[3]) for row in rows]
+
+    async def rebuild(self):
+        previous = self._signature(self._rows)
+        self._pending = {}
+        try:
+            rows = [row for row in await map_ranked_documents(_row) if row is not None]
+        finally:
+            pending, self._pending = self._pending, None
+
+        rows.sort(key=lambda row: row[0])
+        self._rows = rows
+        self._keys = [row[0] for row in rows]
+        self._by_puuid = {row[0][1]: row[0] for row in rows}
+        self._puuids_by_discord_id = {}
+        for row in rows:
+            self._puuids_by_discord_id.setdefault(row[2].get('discord_id'), set()).add(row[0][1])
+        self.distribution.rebuild(row[2] for row in rows)
+        for puuid, row in pending.items():
+            self._insert(puuid, row)
+        # Keep the version (and so every ETag) when the rebuild found nothing the patches hadn't applied
+        if not self.ready or self._signature(self._rows) != previous:
+            self._invalidate()
+        self.ready = True
+        logger.info(f"Leaderboard snapshot rebuilt with {len(self._rows)} ranked accounts (version {self.version})")
+
+    def _active_items(self) -> List[bytes]:
+        """Accounts on the public leaderboard; ``_active_keys`` holds their sort keys."""
+        now = datetime.utcnow()
+        if self._active is None or (self._active_expires_at is not None and now >= self._active_expires_at):
+            if self._active is not None:
+                # Players aged out of the active window, so the public leaderboard changed
+                self.version += 1
+            cutoff = now - timedelta(days=LEADERBOARD_ACTIVE_DAYS)
+            active = [row for row in self._rows if row[1] is not None and row[1] >= cutoff]
+            self._active = [row[3] for row in active]
+            self._active_keys = [row[0] for row in active]
+            self._active_accounts = [row[2] for row in active]
+            # The filter only changes on its own once the oldest active player falls past the cutoff
+            oldest = min((row[1] for row in active), default=None)
+            self._active_expires_at = oldest + timedelta(days=LEADERBOARD_ACTIVE_DAYS) if oldest else None
+        return self._active
+
+    def etag(self, representation: str) -> str:
+        """Weak ETag for one representation (path and query) of the current snapshot.
+
+        Weak because the gzip and identity encodings of a response share it.
+        """
+        self._active_items()
+        digest = hashlib.sha1(representation.encode()).hexdigest()[:12]
+        return f'W/"{self._instance}-{self.version}-{digest}"'
+
+    def page(self, page: int, page_size: int,
+             cursor: Optional[str] = None) -> Tuple[int, bytes, Optional[str]]:
+        """Return (total count, encoded JSON array of the page, next cursor).
+
+        With a ``cursor`` the page starts right after the (elo, puuid) it
+        encodes, so it stays stable while ranks change between requests.
+        """
+        active = self._active_items()
+        if cursor is not None:
+            start = bisect_right(self._active_keys, decode_cursor(cursor))
+        else:
+            start = (page - 1) * page_size
+        end = start + page_size
+        next_cursor = encode_cursor(self._active_keys[end - 1]) if end < len(active) else None
+        return len(active), join_encoded(active[start:end]), next_cursor
+
+    def _active_index(self, puuid: str) -> Optional[int]:
+        key = self._by_puuid.get(puuid)
+        if key is None:
+            return None
+        index = bisect_left(self._active_keys, key)
+        return index if index < len(self._active_keys) and self._active_keys[index] == key else None
+
+    def position(self, puuid: str, neighbors: int) -> Optional[Dict[str, Any]]:
+        """The player's public leaderboard rank, percentile and up to ``neighbors`` players either side."""
+        self._active_items()
+        index = self._active_index(puuid)
+        if index is None:
+            return None
+        total = len(self._active_keys)
+        start = max(0, index - neighbors)
+        return {
+            "rank": index + 1,
+            "total": total,
+            # Share of the leaderboard ranked at or below the player
+            "percentile": round(100 * (total - index) / total, 2),
+            "account": self._active_accounts[index],
+            "above": [{"rank": rank, "account": account}
+                      for rank, account in enumerate(self._active_accounts[start:index], start + 1)],
+            "below": [{"rank": rank, "account": account}
+                      for rank, account in enumerate(self._active_accounts[index + 1:index + 1 + neighbors],
+                                                     index + 2)],
+        }
+
+    def discord_account(self, discord_id: int) -> Optional[Dict[str, Any]]:
+        """Best ranked account linked to ``discord_id``, the one the bots' discord view resolves it to."""
+        keys = [self._by_puuid[puuid] for puuid in self._puuids_by_discord_id.get(discord_id, ())]
+        if not keys:
+            return None
+        return self._rows[bisect_left(self._keys, min(keys))][2]
+
+    def position_by_discord_id(self, discord_id: int, neighbors: int) -> Optional[Dict[str, Any]]:
+        """``position`` of the best ranked account on the public leaderboard linked to ``discord_id``."""
+        self._active_items()
+        indexes = [self._active_index(puuid) for puuid in self._puuids_by_discord_id.get(discord_id, ())]
+        indexes = [index for index in indexes if index is not None]
+        if not indexes:
+            return None
+        return self.position(self._active_keys[min(indexes)][1], neighbors)
+
+    def all(self) -> bytes:
+        return join_encoded(row[3] for row in self._rows)
+
+    def encoded_accounts(self) -> List[bytes]:
+        """The encoded accounts in rank order, copied so later patches don't affect a running export."""
+        return [row[3] for row in self._rows]
+
+    def discord_columns(self) -> bytes:
+        """Columnar discord_id/discord_username/currenttierpatched arrays, cached per snapshot version."""
+        if self._discord_columns is None or self._discord_columns[0] != self.version:
+            self._discord_columns = (self.version, dumps(discord_columns(row[2] for row in self._rows)))
+        return self._discord_columns[1]
+
+
+leaderboard = LeaderboardSnapshot()
@@ -0,0 +1,121 @@
+"""Columnar elo/tier/region view of the ranked accounts.
+
+Kept in step with the leaderboard snapshot: every account owns a slot in a set
+of NumPy arrays and the per-region tier counts are adjusted in place when an
+account changes, so the distribution is summarised with vectorized operations
+and cached until the next change.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from models.ranks import RANK_MAPPING
+from utils.serialization import dumps
+
+# Ordinal 0 is the "Unknown" bucket for accounts whose tier isn't in RANK_MAPPING (e.g. Unrated), so tiers sum to total
+UNKNOWN_TIER = 'Unknown'
+TIER_NAMES = {0: UNKNOWN_TIER, **{ordinal: name for name, ordinal in RANK_MAPPING.items()}}
+TIER_SLOTS = max(RANK_MAPPING.values()) + 1
+ELO_PERCENTILES = (10, 25, 50, 75, 90, 99)
+
+
+def _tier(account: Dict[str, Any]) -> int:
+    return RANK_MAPPING.get(account['rank_details']['data'].get('currenttierpatched'), 0)
+
+
+class RankDistribution:
+    def __init__(self):
+        self._slots: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._elo = np.zeros(0, dtype=np.int32)
+        self._tier = np.zeros(0, dtype=np.int16)
+        self._region = np.zeros(0, dtype=np.int16)
+        self._used = np.zeros(0, dtype=bool)
+        self._regions: List[str] = []
+        self._region_codes: Dict[str, int] = {}
+        # region code x tier ordinal
+        self._counts = np.zeros((0, TIER_SLOTS), dtype=np.int64)
+        self._encoded: Optional[bytes] = None
+
+    def _region_code(self, region: Optional[str]) -> int:
+        region = region or 'unknown'
+        code = self._region_codes.get(region)
+        if code is None:
+            code = self._region_codes[region] = len(self._regions)
+            self._regions.append(region)
+            self._counts = np.vstack([self._counts, np.zeros((1, TIER_SLOTS), dtype=np.int64)])
+        return code
+
+    def _allocate(self, puuid: str) -> int:
+        if not self._free:
+            size = len(self._used)
+            grow = max(size, 64)
+            self._elo = np.concatenate([self._elo, np.zeros(grow, dtype=np.int32)])
+            self._tier = np.concatenate([self._tier, np.zeros(grow, dtype=np.int16)])
+            self._region = np.concatenate([self._region, np.zeros(grow, dtype=np.int16)])
+            self._used = np.concatenate([self._used, np.zeros(grow, dtype=bool)])
+            self._free = list(range(size + grow - 1, size - 1, -1))
+        slot = self._slots[puuid] = self._free.pop()
+        return slot
+
+    def update(self, puuid: str, account: Optional[Dict[str, Any]]):
+        """Set (or with None, drop) one ranked account."""
+        slot = self._slots.get(puuid)
+        if account is None:
+            if slot is None:
+                return
+            self._counts[self._region[slot], self._tier[slot]] -= 1
+            del self._slots[puuid]
+            self._used[slot] = False
+            self._free.append(slot)
+            self._encoded = None
+            return
+
+        tier = _tier(account)
+        region = self._region_code(account.get('region'))
+        if slot is None:
+            slot = self._allocate(puuid)
+            self._used[slot] = True
+            self._counts[region, tier] += 1
+        elif self._tier[slot] != tier or self._region[slot] != region:
+            self._counts[self._region[slot], self._tier[slot]] -= 1
+            self._counts[region, tier] += 1
+        self._elo[slot] = account['rank_details']['data']['elo']
+        self._tier[slot] = tier
+        self._region[slot] = region
+        self._encoded = None
+
+    def rebuild(self, accounts: Iterable[Dict[str, Any]]):
+        accounts = list(accounts)
+        self._slots = {account['puuid']: slot for slot, account in enumerate(accounts)}
+        self._free = []
+        self._elo = np.fromiter((account['rank_details']['data']['elo'] for account in accounts),
+                                dtype=np.int32, count=len(accounts))
+        self._tier = np.fromiter((_tier(account) for account in accounts), dtype=np.int16, count=len(accounts))
+        self._regions, self._region_codes = [], {}
+        self._counts = np.zeros((0, TIER_SLOTS), dtype=np.int64)
+        self._region = np.fromiter((self._region_code(account.get('region')) for account in accounts),
+                                   dtype=np.int16, count=len(accounts))
+        self._used = np.ones(len(accounts), dtype=bool)
+        np.add.at(self._counts, (self._region, self._tier), 1)
+        self._encoded = None
+
+    @staticmethod
+    def _tier_counts(counts: np.ndarray) -> Dict[str, int]:
+        return {TIER_NAMES[ordinal]: int(counts[ordinal]) for ordinal in sorted(TIER_NAMES)}
+
+    def summary(self) -> bytes:
+        """Encoded tier counts, elo percentiles and per-region breakdown, cached until the next update."""
+        if self._encoded is None:
+            elo = self._elo[self._used]
+            percentiles = np.percentile(elo, ELO_PERCENTILES) if elo.size else [None] * len(ELO_PERCENTILES)
+            self._encoded = dumps({
+                "total": int(elo.size),
+                "tiers": self._tier_counts(self._counts.sum(axis=0)),
+                "elo_percentiles": {f"p{p}": None if value is None else float(value)
+                                    for p, value in zip(ELO_PERCENTILES, percentiles)},
+                "regions": {region: {"total": int(self._counts[code].sum()),
+                                     "tiers": self._tier_counts(self._counts[code])}
+                            for code, region in enumerate(self._regions) if self._counts[code].any()},
+            })
+        return self._encoded
@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from models.db.valorant import MongoImagesModel, MongoRankDetailsDataModel, MongoRankDetailsModel, \
+    MongoAccountResponseModel
+from services.accounts import get_account
+from services.leaderboard import leaderboard
+from services.write_batcher import account_writes
+from utils.change_feed import account_changes, account_tier, discord_id_change
+from utils.henrik import henrik
+from utils.rate_limit import BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+
+class AccountNotFound(Exception):
+    pass
+
+
+def latest_history_date_raw(mmr_history_json: Dict[str, Any]) -> Optional[int]:
+    if mmr_history_json.get('data') and len(mmr_history_json['data']) > 0:
+        return mmr_history_json['data'][0].get('date_raw')
+    return None
+
+
+def last_elo_change_from_history(mmr_history_json: Dict[str, Any]) -> datetime:
+    date_raw = latest_history_date_raw(mmr_history_json)
+    if date_raw is not None:
+        return datetime.utcfromtimestamp(date_raw)
+    return datetime.utcnow()
+
+
+def rank_payload_hash(name: str, tag: str, rank_details_json: Dict[str, Any]) -> str:
+    payload = json.dumps({'name': name, 'tag': tag, 'rank_details': rank_details_json}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def apply_rank_details(account: MongoAccountResponseModel,
+                       acc_details_json: Optional[Dict[str, Any]],
+                       rank_details_json: Dict[str, Any],
+                       mmr_history_json: Optional[Dict[str, Any]]):
+    """Apply fresh Henrik data to ``account``.
+
+    ``acc_details_json`` or ``mmr_history_json`` may be ``None`` when that fetch
+    failed; the stored name/tag or last elo change timestamp are kept instead.
+    """
+    previous_data = account.rank_details.data if account.rank_details else None
+
+    # Update account details
+    if acc_details_json is not None:
+        account.name = acc_details_json['data']['name']
+        account.tag = acc_details_json['data']['tag']
+
+    # Process rank details from the mmr endpoint
+    data = rank_details_json['data']
+    images_data = data.pop('images')
+    images = MongoImagesModel(**images_data)
+
+    # Use the mmr-history endpoint to set the last elo change timestamp
+    if mmr_history_json is not None:
+        data['last_elo_change_timestamp'] = last_elo_change_from_history(mmr_history_json)
+    elif previous_data is not None and previous_data.last_elo_change_timestamp is not None:
+        data['last_elo_change_timestamp'] = previous_data.last_elo_change_timestamp
+
+    rank_details_data = MongoRankDetailsDataModel(images=images, **data)
+    account.rank_details = MongoRankDetailsModel(status=rank_details_json['status'], data=rank_details_data)
+
+
+async def _fetch_optional(coro, puuid: str, what: str) -> Optional[Dict[str, Any]]:
+    try:
+        return await coro
+    except Exception as e:
+        logger.warning(f"{what} fetch failed for {puuid}, keeping stored values: {e}")
+        return None
+
+
+def _account_written(account: MongoAccountResponseModel, previous_tier: Optional[str]):
+    leaderboard.upsert(account)
+    # The member's roles follow their best ranked linked account, which may not be this one
+    if account_tier(account) != previous_tier and account.discord_id != 0:
+        account_changes.publish(discord_id_change(account.discord_id, leaderboard.discord_account(account.discord_id)))
+
+
+async def refresh_account(account: MongoAccountResponseModel,
+                          lane: str = BACKGROUND,
+                          incremental: bool = False,
+                          on_written: Optional[Callable[[str, Optional[Exception]], None]] = None) -> bool:
+    """Fetch the latest account, rank and mmr-history data from Henrik and persist it.
+
+    The account, rank and mmr-history fetches are independent of each other since
+    the region is already stored, so they run concurrently. Only a failed rank
+    fetch fails the refresh; a failed account or mmr-history fetch keeps the
+    stored name/tag or last elo change timestamp.
+
+    With ``incremental`` set, mmr-history is fetched first and the player is
+    skipped entirely when its latest entry matches the stored watermark. In
+    either mode the DB write is skipped when neither the rank payload hash nor
+    the watermark changed. Returns whether the stored account changed.
+
+    Changed fields are written through the account write batcher. By default the
+    write is flushed right away and awaited; with ``on_written`` it is left to
+    the next batch flush, which calls ``on_written(puuid, error)`` with the
+    write error or None.
+    """
+    puuid = account.puuid
+    account_path = f'/valorant/v1/by-puuid/account/{puuid}'
+    rank_path = f'/valorant/v1/by-puuid/mmr/{account.region}/{puuid}'
+    history_path = f'/valorant/v1/by-puuid/mmr-history/{account.region}/{puuid}'
+
+    if incremental:
+        mmr_history_json = await _fetch_optional(henrik.get_json(history_path, lane=lane), puuid, "MMR history")
+        if (mmr_history_json is not None and account.rank_payload_hash is not None
+                and latest_history_date_raw(mmr_history_json) == account.last_mmr_history_date_raw):
+            return False
+        acc_details_json, rank_details_json = await asyncio.gather(
+            _fetch_optional(henrik.get_json(account_path, lane=lane), puuid, "Account"),
+            henrik.get_json(rank_path, lane=lane),
+        )
+    else:
+        acc_details_json, rank_details_json, mmr_history_json = await asyncio.gather(
+            _fetch_optional(henrik.get_json(account_path, lane=lane), puuid, "Account"),
+            henrik.get_json(rank_path, lane=lane),
+            _fetch_optional(henrik.get_json(history_path, lane=lane), puuid, "MMR history"),
+        )
+
+    name = acc_details_json['data']['name'] if acc_details_json is not None else account.name
+    tag = acc_details_json['data']['tag'] if acc_details_json is not None else account.tag
+    payload_hash = rank_payload_hash(name, tag, rank_details_json)
+    if mmr_history_json is not None:
+        history_date_raw = latest_history_date_raw(mmr_history_json)
+    else:
+        history_date_raw = account.last_mmr_history_date_raw
+
+    if payload_hash == account.rank_payload_hash and history_date_raw == account.last_mmr_history_date_raw:
+        return False
+
+    previous_tier = account_tier(account)
+    apply_rank_details(account, acc_details_json, rank_details_json, mmr_history_json)
+    account.rank_payload_hash = payload_hash
+    account.last_mmr_history_date_raw = history_date_raw
+    if on_written is None:
+        await account_writes.write(account)
+        _account_written(account, previous_tier)
+        return True
+
+    def written(error: Optional[Exception]):
+        if error is None:
+            _account_written(account, previous_tier)
+        on_written(puuid, error)
+
+    account_writes.submit(account, written)
+    return True
+
+
+async def load_account(puuid: str) -> MongoAccountResponseModel:
+    account = await get_account(puuid)
+    if not account:
+        raise AccountNotFound(puuid)
+    return account
+
+
+async def refresh_account_rank(puuid: str, lane: str = BACKGROUND) -> MongoAccountResponseModel:
+    account = await load_account(puuid)
+    await refresh_account(account, lane=lane)
+    return account
@@ -0,0 +1,147 @@
+"""Write-behind batching of account updates.
+
+Refreshed accounts are queued as ``$set``/``$unset`` updates of just their
+changed fields and flushed together as one unordered ``bulk_write`` once the
+batch is full or the flush interval has passed, instead of a full-document
+``save()`` round trip per player. Each queued update gets its outcome back,
+including per-document write errors.
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from mongoengine import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, WriteError
+
+from models.db.valorant import MongoAccountResponseModel
+from services.accounts import bulk_write_accounts
+
+logger = logging.getLogger(__name__)
+
+ACCOUNT_WRITE_BATCH_SIZE = int(os.getenv('ACCOUNT_WRITE_BATCH_SIZE', 100))
+ACCOUNT_WRITE_FLUSH_INTERVAL = float(os.getenv('ACCOUNT_WRITE_FLUSH_INTERVAL', 1))
+
+WriteCallback = Callable[[Optional[Exception]], None]
+
+
+class AccountWriteBatcher:
+    def __init__(self, batch_size: int = ACCOUNT_WRITE_BATCH_SIZE,
+                 flush_interval: float = ACCOUNT_WRITE_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # account id -> (fields to $set, fields to $unset, callbacks); later updates to a queued account are merged
+        self._pending: Dict[Any, Tuple[Dict[str, Any], Dict[str, Any], List[WriteCallback]]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes = set()
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+
+    def submit(self, account: MongoAccountResponseModel, callback: WriteCallback):
+        """Queue the account's changed fields; ``callback`` gets None once written or the write error."""
+        # Document.save() validated before writing; a bad Henrik payload must not reach Mongo through $set either
+        try:
+            account.validate()
+        except ValidationError as e:
+            self.failed += 1
+            logger.warning(f"Account {account.pk} failed validation, not written: {e}")
+            callback(e)
+            return
+
+        # _delta() and _clear_changed_fields() are private mongoengine APIs; checked against the
+        # mongoengine version pinned in requirements/backend.txt, recheck them when upgrading it
+        sets, unsets = account._delta()
+        account._clear_changed_fields()
+        if not sets and not unsets:
+            callback(None)
+            return
+
+        pending = self._pending.get(account.pk)
+        if pending is None:
+            self._pending[account.pk] = (dict(sets), dict(unsets), [callback])
+        else:
+            for field in sets:
+                pending[1].pop(field, None)
+            for field in unsets:
+                pending[0].pop(field, None)
+            pending[0].update(sets)
+            pending[1].update(unsets)
+            pending[2].append(callback)
+
+        if len(self._pending) >= self.batch_size:
+            self._flush_soon(0)
+        elif self._timer is None:
+            self._flush_soon(self.flush_interval)
+
+    async def write(self, account: MongoAccountResponseModel):
+        """Write the account now, together with anything already queued, and raise its write error if any."""
+        written = asyncio.get_running_loop().create_future()
+        self.submit(account, lambda error: written.set_result(error))
+        await self.flush()
+        error = await written
+        if error is not None:
+            raise error
+
+    def _flush_soon(self, delay: float):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._start_flush)
+
+    def _start_flush(self):
+        self._timer = None
+        task = asyncio.create_task(self._write_pending())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self):
+        """Write everything queued and wait for batches already being written, so every callback has run."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self._write_pending()
+        if self._flushes:
+            await asyncio.gather(*list(self._flushes), return_exceptions=True)
+
+    async def _write_pending(self):
+        batch, self._pending = list(self._pending.items()), {}
+        if not batch:
+            return
+
+        operations = []
+        for pk, (sets, unsets, _) in batch:
+            update = {}
+            if sets:
+                update['$set'] = sets
+            if unsets:
+                update['$unset'] = unsets
+            operations.append(UpdateOne({'_id': pk}, update))
+
+        errors: Dict[int, Exception] = {}
+        try:
+            await bulk_write_accounts(operations)
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                errors[error['index']] = WriteError(error['errmsg'], error['code'], error)
+        except Exception as e:
+            errors = {index: e for index in range(len(batch))}
+
+        self.batches += 1
+        self.failed += len(errors)
+        self.written += len(batch) - len(errors)
+        if errors:
+            logger.warning(f"Account write batch: {len(errors)} of {len(batch)} updates failed")
+        for index, (_, (_, _, callbacks)) in enumerate(batch):
+            for callback in callbacks:
+                try:
+                    callback(errors.get(index))
+                except Exception as e:
+                    logger.error(f"Account write callback failed: {e}")
+
+    def stats(self):
+        return {"pending": len(self._pending), "batches": self.batches, "written": self.written,
+                "failed": self.failed}
+
+
+account_writes = AccountWriteBatcher()
@@ -0,0 +1,16 @@
+import os
+
+import mongoengine
+import mongomock
+import pytest
+
+# utils.henrik refuses to import without a token; the tests never call the Henrik API
+os.environ.setdefault('HENRIK_API_TOKEN', 'test')
+
+
+@pytest.fixture
+def db():
+    mongoengine.connect('valorantsl-test', host='mongodb://localhost', mongo_client_class=mongomock.MongoClient,
+                        uuidRepresentation='standard')
+    yield
+    mongoengine.disconnect()
@@ -0,0 +1,111 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from models.db.valorant import MongoAccountResponseModel, MongoRankDetailsDataModel, MongoRankDetailsModel
+from routes import valorant as routes_valorant
+from services import valorant
+from services.leaderboard import LeaderboardSnapshot
+from utils.change_feed import AccountChange, account_changes, account_tier
+
+
+def make_account(puuid, discord_username, discord_id, elo, tier):
+    return MongoAccountResponseModel(
+        puuid=puuid, name=puuid, tag='SL', region='ap', discord_id=discord_id, discord_username=discord_username,
+        rank_details=MongoRankDetailsModel(status=200,
+                                           data=MongoRankDetailsDataModel(elo=elo, currenttierpatched=tier)),
+    )
+
+
+def test_tier_change_on_lower_linked_account_publishes_best_account(monkeypatch):
+    snapshot = LeaderboardSnapshot()
+    monkeypatch.setattr(valorant, 'leaderboard', snapshot)
+    main = make_account('main', 'player', 42, 2100, 'Immortal 1')
+    smurf = make_account('smurf', 'player-alt', 42, 1200, 'Gold 1')
+    snapshot.upsert(main)
+    snapshot.upsert(smurf)
+
+    queue = account_changes.subscribe()
+    try:
+        previous_tier = account_tier(smurf)
+        smurf.rank_details.data.elo = 1300
+        smurf.rank_details.data.currenttierpatched = 'Gold 2'
+        valorant._account_written(smurf, previous_tier)
+
+        change = queue.get_nowait()
+        assert change.discord_id == 42
+        assert change.discord_username == 'player'
+        assert change.currenttierpatched == 'Immortal 1'
+        assert queue.empty()
+    finally:
+        account_changes.unsubscribe(queue)
+
+
+def test_tier_change_on_unlinked_account_publishes_nothing(monkeypatch):
+    snapshot = LeaderboardSnapshot()
+    monkeypatch.setattr(valorant, 'leaderboard', snapshot)
+    account = make_account('unlinked', 'nobody', 0, 1200, 'Gold 1')
+    snapshot.upsert(account)
+
+    queue = account_changes.subscribe()
+    try:
+        account.rank_details.data.currenttierpatched = 'Gold 2'
+        valorant._account_written(account, 'Gold 1')
+        assert queue.empty()
+    finally:
+        account_changes.unsubscribe(queue)
+
+
+def drain(queue):
+    changes = []
+    while not queue.empty():
+        changes.append(queue.get_nowait())
+    return changes
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    snapshot = LeaderboardSnapshot()
+    monkeypatch.setattr(routes_valorant, 'leaderboard', snapshot)
+    app = FastAPI()
+    app.include_router(routes_valorant.valorant)
+    main = make_account('main', 'player', 42, 2100, 'Immortal 1')
+    smurf = make_account('smurf', 'player-alt', 142, 1200, 'Gold 1')
+    for account in (main, smurf):
+        account.save()
+        snapshot.upsert(account)
+
+    queue = account_changes.subscribe()
+    yield TestClient(app), queue
+    account_changes.unsubscribe(queue)
+
+
+def test_rebinding_onto_a_higher_ranked_member_publishes_their_best_account(client):
+    test_client, queue = client
+
+    response = test_client.put('/valorant/update/discord/142/42/player-alt2')
+
+    assert response.status_code == 200
+    assert drain(queue) == [AccountChange(42, 'player', 'Immortal 1'), AccountChange(142, None, None)]
+
+
+def test_batch_rebinding_publishes_one_change_per_member(client, monkeypatch):
+    test_client, queue = client
+
+    async def update_discord_bindings(updates):
+        # mongomock has no bulk_write for this pymongo version; apply the same updates one by one
+        modified = 0
+        for old_id, new_id, username in updates:
+            modified += MongoAccountResponseModel.objects(discord_id=old_id).update(
+                discord_id=new_id, discord_username=username)
+        return {"matched": modified, "modified": modified, "errors": []}
+
+    monkeypatch.setattr(routes_valorant, 'update_discord_bindings', update_discord_bindings)
+
+    response = test_client.put('/valorant/update/discord/batch', json=[
+        {"discord_id_old": 142, "discord_id_new": 42, "discord_username_new": "player-alt2"},
+    ])
+
+    assert response.status_code == 200
+    changes = drain(queue)
+    assert sorted(changes) == [AccountChange(42, 'player', 'Immortal 1'), AccountChange(142, None, None)]
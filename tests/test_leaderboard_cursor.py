@@ -0,0 +1,25 @@
+import base64
+import json
+
+import pytest
+
+from services.leaderboard import InvalidCursor, decode_cursor, encode_cursor
+
+
+def cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor((-1500, 'puuid'))) == (-1500, 'puuid')
+
+
+@pytest.mark.parametrize('value', [[1500.5, 'x'], [1500.0, 'x'], [True, 'x'], [1500, 7], [1500]])
+def test_malformed_cursor_is_rejected(value):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor(value))
+
+
+def test_overflowing_elo_is_rejected():
+    with pytest.raises(InvalidCursor):
+        decode_cursor('WzFlNDAwLCJ4Il0=')
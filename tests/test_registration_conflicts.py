@@ -0,0 +1,23 @@
+import asyncio
+
+from models.db.valorant import MongoAccountResponseModel
+from routes.valorant import _registration_conflict
+from services.accounts import find_registration_conflicts
+
+
+def save(puuid, discord_id, discord_username):
+    MongoAccountResponseModel(puuid=puuid, name=puuid, tag='SL', region='ap', discord_id=discord_id,
+                              discord_username=discord_username).save()
+
+
+def test_puuid_clash_is_reported_when_discord_id_has_several_accounts(db):
+    save('main', 42, 'player')
+    save('smurf', 42, 'player-alt')
+    save('other', 7, 'taken-name')
+    save('taken-puuid', 8, 'someone')
+
+    conflicts = asyncio.run(find_registration_conflicts('taken-puuid', 42, 'taken-name'))
+
+    assert {account['puuid'] for account in conflicts} == {'main', 'smurf', 'other', 'taken-puuid'}
+    assert _registration_conflict(conflicts, 'taken-puuid', 42, 'taken-name') == \
+        "Riot account already exists in the database."
@@ -0,0 +1,41 @@
+import asyncio
+
+from bson import ObjectId
+from mongoengine import ValidationError
+
+from models.db.valorant import MongoAccountResponseModel
+from services import write_batcher
+from services.write_batcher import AccountWriteBatcher
+
+
+def test_invalid_account_is_reported_and_not_queued():
+    batcher = AccountWriteBatcher()
+    account = MongoAccountResponseModel(puuid='p1', tag='SL', region='ap', discord_id=1, discord_username='player')
+    errors = []
+
+    batcher.submit(account, errors.append)
+
+    assert len(errors) == 1 and isinstance(errors[0], ValidationError)
+    assert batcher.stats() == {"pending": 0, "batches": 0, "written": 0, "failed": 1}
+
+
+def test_flush_waits_for_a_batch_already_being_written(monkeypatch):
+    async def slow_bulk_write(operations):
+        await asyncio.sleep(0.05)
+
+    monkeypatch.setattr(write_batcher, 'bulk_write_accounts', slow_bulk_write)
+
+    async def run():
+        batcher = AccountWriteBatcher(batch_size=1)
+        written = []
+        account = MongoAccountResponseModel._from_son({'_id': ObjectId(), 'puuid': 'p1', 'name': 'p1', 'tag': 'SL',
+                                                       'region': 'ap', 'discord_id': 1, 'discord_username': 'player'})
+        account.name = 'renamed'
+        batcher.submit(account, written.append)
+        # Let the size trigger start its flush, then flush with nothing left pending
+        await asyncio.sleep(0.01)
+        assert written == []
+        await batcher.flush()
+        return written
+
+    assert asyncio.run(run()) == [None]
@@ -73,8 +73,13 @@ def show_leaderboard():
     page = st.session_state.get('page', 1)
     page_size = 50
 
+    # Cursor that starts each page we've already reached, keyed by page number
+    page_cursors = st.session_state.setdefault('page_cursors', {1: None})
+
     # Fetch data
-    leaderboard_data, total_count = fetch_leaderboard_data(page, page_size)
+    leaderboard_data, total_count, next_cursor = fetch_leaderboard_data(page, page_size, page_cursors.get(page))
+    if next_cursor:
+        page_cursors[page + 1] = next_cursor
     start_index = (page - 1) * page_size + 1
     leaderboard_df = process_leaderboard_data(leaderboard_data, start_index)
 
@@ -8,11 +8,16 @@ VALORANTSL_API_URL = os.getenv("VALORANTSL_API_URL", "http://fastapi:8000")
 
 
 @st.cache_data(ttl=timedelta(minutes=30))
-def fetch_leaderboard_data(page, page_size):
-    response = requests.get(f"{VALORANTSL_API_URL}/valorant/leaderboard?page={page}&page_size={page_size}")
+def fetch_leaderboard_data(page, page_size, cursor=None):
+    # The cursor from the previous page keeps deep pages as cheap as page 1
+    params = {"page": page, "page_size": page_size}
+    if cursor:
+        params["cursor"] = cursor
+    response = requests.get(f"{VALORANTSL_API_URL}/valorant/leaderboard", params=params)
     leaderboard_data = response.json()
     total_count = int(response.headers.get("X-Total-Count", 0))
-    return leaderboard_data, total_count
+    next_cursor = response.headers.get("X-Next-Cursor")
+    return leaderboard_data, total_count, next_cursor
 
 
 def get_discord_login_url():
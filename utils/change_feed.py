@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Events a subscriber can fall behind by before new ones are dropped; the bots' periodic sweep catches up
+CHANGE_FEED_QUEUE_SIZE = 1000
+
+
+class AccountChange(NamedTuple):
+    discord_id: int
+    discord_username: Optional[str]
+    # None when the account is unranked, same as a member missing from the leaderboard
+    currenttierpatched: Optional[str]
+
+    @classmethod
+    def from_account(cls, account) -> 'AccountChange':
+        return cls(account.discord_id, account.discord_username, account_tier(account))
+
+
+def discord_id_change(discord_id: int, account: Optional[Dict[str, Any]]) -> AccountChange:
+    """Change for ``discord_id``; ``account`` is the best ranked account linked to it, or None if there is none."""
+    if account is None:
+        return AccountChange(discord_id, None, None)
+    return AccountChange(discord_id, account['discord_username'],
+                         account['rank_details']['data'].get('currenttierpatched'))
+
+
+def account_tier(account) -> Optional[str]:
+    data = account.rank_details.data if account.rank_details else None
+    if data is None or not data.elo:
+        return None
+    return data.currenttierpatched
+
+
+class ChangeFeed:
+    """In-process pub/sub of account changes that affect a member's Discord roles.
+
+    Every subscriber gets its own bounded queue, so a slow consumer never blocks
+    the API or the background updater that publish.
+    """
+
+    def __init__(self):
+        self._subscribers: List[asyncio.Queue] = []
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=CHANGE_FEED_QUEUE_SIZE)
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    def publish(self, change: AccountChange):
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(change)
+            except asyncio.QueueFull:
+                logger.warning(f"Change feed subscriber is full, dropping change for {change.discord_id}")
+
+
+account_changes = ChangeFeed()
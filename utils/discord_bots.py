@@ -5,6 +5,10 @@ import os
 import aiohttp
 import discord
 
+from utils.change_feed import account_changes
+from utils.discord_dispatcher import member_sync_queue
+from utils.discord_leaderboard import LEADERBOARD_SNAPSHOT_MAX_AGE, shared_leaderboard
+
 # Define intents
 intents = discord.Intents.default()
 intents.members = True
@@ -13,6 +17,14 @@ DISCORD_BOT_TOKEN_1 = os.getenv('DISCORD_BOT_TOKEN_1')
 DISCORD_BOT_TOKEN_2 = os.getenv('DISCORD_BOT_TOKEN_2')
 DISCORD_GUILD_ID = int(os.getenv('DISCORD_GUILD_ID'))
 VALORANTSL_API_URL = os.getenv('VALORANTSL_API_URL')
+# Database users whose discord_id is this close to a member's ID are treated as that member
+DISCORD_ID_MATCH_DISTANCE = 200
+# Members are updated as their accounts change; the full sweep only reconciles anything that was missed
+DISCORD_SYNC_INTERVAL = int(os.getenv('DISCORD_SYNC_INTERVAL', 3 * 60 * 60))
+# Member sync workers per bot; discord.py paces their requests per rate limit bucket
+DISCORD_SYNC_WORKERS = int(os.getenv('DISCORD_SYNC_WORKERS', 2))
+# Rate limit waits longer than this hand the member back to the shared queue (discord.py requires >= 30)
+DISCORD_MAX_RATELIMIT_WAIT = float(os.getenv('DISCORD_MAX_RATELIMIT_WAIT', 30))
 
 
 class ScriptFilter(logging.Filter):
@@ -58,84 +70,117 @@ RANK_NAMES_MAPPER = {
 class DiscordBotBackgroundRunner:
     def __init__(self, bot_id):
         self.bot_id = bot_id
-        self.client = discord.Client(intents=intents)
+        self.client = discord.Client(intents=intents, max_ratelimit_timeout=DISCORD_MAX_RATELIMIT_WAIT)
         self.logger = logger1 if bot_id == 1 else logger2
+        self.change_watcher = None
+        self.sync_workers = []
 
         if bot_id == 1:
             @self.client.event
             async def on_member_join(member):
                 guild = discord.utils.get(self.client.guilds, id=DISCORD_GUILD_ID)
                 if guild:
-                    db_response = await self.get_info_from_db(self.logger)
+                    # A new member may have registered moments ago, so always revalidate the snapshot
+                    db_response = await self.get_info_from_db(self.logger, max_age=0)
                     self.logger.info(f'New member joined: {member.name} (ID: {member.id})')
-                    await bot1.update_discord_roles(member, db_response, self.logger)
+                    self.queue_member_sync(member, db_response)
 
         @self.client.event
         async def on_ready():
             self.logger.info(f'{self.client.user} has connected to Discord!')
-            await self.main_loop()
-
-    async def get_info_from_db(self, logger):
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f'{VALORANTSL_API_URL}/valorant/leaderboard/all') as response:
-                if response.status == 200:
-                    logger.info("Successfully retrieved leaderboard data")
-                    data = await response.json()
-                    return data
-                else:
-                    logger.error(f"Failed to get leaderboard data: HTTP {response.status}")
-                    return None
+            # Only a bot that can see the guild takes members off the shared queue
+            guild = discord.utils.get(self.client.guilds, id=DISCORD_GUILD_ID)
+            if guild and not self.sync_workers:
+                self.sync_workers = [asyncio.create_task(self.sync_worker()) for _ in range(DISCORD_SYNC_WORKERS)]
+            if bot_id == 1:
+                if self.change_watcher is None:
+                    self.change_watcher = asyncio.create_task(self.watch_account_changes())
+                await self.main_loop()
+
+    async def get_info_from_db(self, logger, max_age=LEADERBOARD_SNAPSHOT_MAX_AGE):
+        return await shared_leaderboard.get(logger, max_age=max_age)
 
     async def update_database_discord_data(self, member, db_response, logger):
+        """Return the discord_id/username corrections for database users close to this member's ID."""
         discord_id = int(member.id)
         discord_username = member.name
 
-        match_found = False
-
-        for database_user in db_response:
+        corrections = []
+        nearby_users = db_response.near(discord_id, DISCORD_ID_MATCH_DISTANCE)
+        for database_user in nearby_users:
             db_discord_id = int(database_user['discord_id'])
             db_username = database_user['discord_username']
-
-            if abs(discord_id - db_discord_id) <= 200:
-                match_found = True
-                async with aiohttp.ClientSession() as session:
-                    async with session.put(
-                            f'{VALORANTSL_API_URL}/valorant/update/discord/{db_discord_id}/{discord_id}/{discord_username}') as response:
-                        if response.status == 200:
-                            logger.info(f"Updated database discord_id | {db_discord_id} --> {discord_id},"
-                                        f" discord_username | {db_username} --> {discord_username}")
-
-        if not match_found:
+            if db_discord_id == discord_id and db_username == discord_username:
+                continue
+            corrections.append({
+                'discord_id_old': db_discord_id,
+                'discord_id_new': discord_id,
+                'discord_username_new': discord_username,
+            })
+            logger.info(f"Queued database update for discord_id | {db_discord_id} --> {discord_id},"
+                        f" discord_username | {db_username} --> {discord_username}")
+
+        if not nearby_users:
             logger.info(f"Discord ID {discord_id} not found in database. Username: {discord_username}")
+        return corrections
+
+    async def send_discord_corrections(self, corrections, logger):
+        if not corrections:
+            return
+        async with aiohttp.ClientSession() as session:
+            async with session.put(f'{VALORANTSL_API_URL}/valorant/update/discord/batch',
+                                   json=corrections) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    logger.info(f"Updated database discord data: {result['modified']} of {len(corrections)}"
+                                f" corrections applied")
+                    for error in result['errors']:
+                        logger.error(f"Failed to apply {corrections[error['index']]}: {error['detail']}")
+                else:
+                    logger.error(f"Failed to update database discord data: HTTP {response.status}")
 
     async def update_nickname(self, member, global_name, rank_tier, logger):
+        """Set the member's rank nickname; returns whether an edit was needed."""
         mapped_rank = RANK_NAMES_MAPPER.get(rank_tier, rank_tier)
         new_nickname = f"{global_name} ({mapped_rank})"
+        if member.nick == new_nickname:
+            return False
         try:
             await member.edit(nick=new_nickname)
             logger.info(f"Updated display name for discord username: {member.name} -> {new_nickname}")
         except discord.errors.Forbidden:
             logger.warning(f"Bot does not have permissions to update display name for discord username: {member.name}")
+        return True
+
+    @staticmethod
+    def can_manage_role(guild, role):
+        # Integration roles (e.g. Server Booster) and roles at or above the bot's own can't be changed by it
+        return role != guild.default_role and not role.managed and role < guild.me.top_role
 
     async def update_roles(self, member, new_roles, logger):
-        try:
-            roles_to_remove = [role for role in member.roles if role.name != "@everyone"]
+        """Add and remove only the roles that differ from ``new_roles``; returns whether any call was needed."""
+        current_roles = {role for role in member.roles if self.can_manage_role(member.guild, role)}
+        desired_roles = {role for role in new_roles if role is not None and self.can_manage_role(member.guild, role)}
+        roles_to_remove = current_roles - desired_roles
+        roles_to_add = desired_roles - current_roles
+        if not roles_to_remove and not roles_to_add:
+            return False
 
+        try:
             if roles_to_remove:
                 await member.remove_roles(*roles_to_remove)
                 logger.info(f"{member.name} : Removed roles: {', '.join(role.name for role in roles_to_remove)}")
-            else:
-                logger.info(f"{member.name} : No roles to remove")
 
-            if new_roles:
-                await member.add_roles(*new_roles)
-                logger.info(f"{member.name} : Added roles: {', '.join(role.name for role in new_roles)}")
+            if roles_to_add:
+                await member.add_roles(*roles_to_add)
+                logger.info(f"{member.name} : Added roles: {', '.join(role.name for role in roles_to_add)}")
 
         except discord.errors.Forbidden:
             logger.warning(f"Bot does not have permissions to update roles for discord username: {member.name}")
 
         except discord.errors.NotFound as e:
             logger.error(f"Role not found in the server: {e}")
+        return True
 
     async def get_new_roles(self, member, rank_tier):
         new_roles = []
@@ -151,35 +196,68 @@ class DiscordBotBackgroundRunner:
             new_roles = [omega_role, rank_role, verified_role]
         return new_roles
 
-    async def update_discord_roles(self, member, db_response, logger):
+    def queue_member_sync(self, member, db_response):
+        # Find the user in db_response
+        member_sync_queue.submit(int(member.id), db_response.by_discord_id.get(int(member.id)))
+
+    async def sync_member(self, member, user_data, logger):
+        """Bring one member's nickname and roles in line with their leaderboard row (None if not ranked)."""
         global_name = member.global_name
-        discord_id = int(member.id)
         discord_username = member.name
 
-        # Find the user in db_response
-        user_data = next((user for user in db_response if int(user['discord_id']) == discord_id), None)
-
         if user_data:
             # Safely get the rank details
-            rank = user_data.get('rank_details', {}).get('data', {}).get('currenttierpatched', 'Unknown')
+            rank = user_data.get('currenttierpatched') or 'Unknown'
             rank_tier = rank.split(' ')[0]
 
-            await self.update_nickname(member, global_name, rank_tier, logger)
+            changed = await self.update_nickname(member, global_name, rank_tier, logger)
 
             # Check for "Manual" role
             manual_role = discord.utils.get(member.guild.roles, name="Manual")
             if manual_role in member.roles:
                 logger.info(f"Skipping role update for {discord_username} as they have 'Manual' role.")
-                return
-
-            new_roles = await self.get_new_roles(member, rank_tier)
-            await self.update_roles(member, new_roles, logger)
+            else:
+                new_roles = await self.get_new_roles(member, rank_tier)
+                changed = await self.update_roles(member, new_roles, logger) or changed
 
         else:
             unverified_role = discord.utils.get(member.guild.roles, name="Unverified")
             new_roles = [unverified_role]
-            await self.update_roles(member, new_roles, logger)
-            await self.update_nickname(member, global_name, "Unverified", logger)
+            changed = await self.update_roles(member, new_roles, logger)
+            changed = await self.update_nickname(member, global_name, "Unverified", logger) or changed
+
+        member_sync_queue.record(self.bot_id, changed)
+        return changed
+
+    async def sync_worker(self):
+        """Take members off the shared queue and sync them through this bot's own client."""
+        while True:
+            discord_id, user_data = await member_sync_queue.take()
+            guild = discord.utils.get(self.client.guilds, id=DISCORD_GUILD_ID)
+            member = guild.get_member(discord_id) if guild else None
+            if member is None:
+                continue
+            try:
+                await self.sync_member(member, user_data, self.logger)
+            except discord.errors.RateLimited as e:
+                # Let the other bot's workers pick the member up while this token's bucket refills
+                self.logger.warning(f"Rate limited syncing {member.name}, pausing for {e.retry_after:.1f}s")
+                member_sync_queue.requeue(discord_id, user_data)
+                await asyncio.sleep(e.retry_after)
+            except Exception as e:
+                self.logger.error(f"Error syncing {member.name}: {e}")
+
+    async def watch_account_changes(self):
+        """Update members as soon as the API publishes a change to their tier or discord binding."""
+        changes = account_changes.subscribe()
+        try:
+            while True:
+                change = await changes.get()
+                user_data = change._asdict() if change.currenttierpatched is not None else None
+                self.logger.info(f"Account change for {change.discord_id}: {change.currenttierpatched}")
+                member_sync_queue.submit(change.discord_id, user_data)
+        finally:
+            account_changes.unsubscribe(changes)
 
     async def main_loop(self):
         await self.client.wait_until_ready()  # Wait until the client is ready
@@ -189,28 +267,23 @@ class DiscordBotBackgroundRunner:
                 if guild:
                     db_response = await self.get_info_from_db(self.logger)
                     members = sorted(guild.members, key=lambda member: member.id)
-                    half_members = len(members) // 2
-
-                    if self.bot_id == 1:
-                        target_members = members[:half_members]  # First half
-                    else:
-                        target_members = members[half_members:]  # Second half
 
-                    for member in target_members:
-                        await self.update_discord_roles(member, db_response, self.logger)
-                        await asyncio.sleep(0.5)
+                    # Both bots' sync workers share the queued members
+                    for member in members:
+                        self.queue_member_sync(member, db_response)
+                    self.logger.info(f"Role sync: queued {len(members)} members (totals across both bots:"
+                                     f" {member_sync_queue.stats()})")
 
-                    # Bot 1 still updates the database for all members
-                    if self.bot_id == 1:
-                        for member in members:
-                            await self.update_database_discord_data(member, db_response, self.logger)
-                            await asyncio.sleep(0.5)
+                    corrections = []
+                    for member in members:
+                        corrections.extend(await self.update_database_discord_data(member, db_response, self.logger))
+                    await self.send_discord_corrections(corrections, self.logger)
 
             except Exception as e:
                 self.logger.error(f"Error in main loop: {e}")
             finally:
-                self.logger.info("Sleeping for 15 minutes before next iteration.")
-                await asyncio.sleep(15 * 60)
+                self.logger.info(f"Sleeping for {DISCORD_SYNC_INTERVAL // 60} minutes before next reconciliation.")
+                await asyncio.sleep(DISCORD_SYNC_INTERVAL)
 
     async def run(self):
         await self.client.start(DISCORD_BOT_TOKEN_1 if self.bot_id == 1 else DISCORD_BOT_TOKEN_2)
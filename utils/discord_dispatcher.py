@@ -0,0 +1,61 @@
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+
+
+class MemberSyncQueue:
+    """Member role/nickname syncs shared by both bots.
+
+    Each bot runs workers that take the next member whenever they are free, so
+    work spreads across both tokens by how fast each one's rate limit buckets
+    drain rather than by a fixed split. Submitting a member that is already
+    queued only replaces its pending leaderboard row.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: Dict[int, Optional[Dict[str, Any]]] = {}
+        self.requeued = 0
+        # Per bot: members whose roles/nickname needed Discord calls vs. members already in sync
+        self.updated: Dict[int, int] = {}
+        self.skipped: Dict[int, int] = {}
+
+    def _get_queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    def submit(self, discord_id: int, user_data: Optional[Dict[str, Any]]):
+        queued = discord_id in self._pending
+        self._pending[discord_id] = user_data
+        if not queued:
+            self._get_queue().put_nowait(discord_id)
+
+    def requeue(self, discord_id: int, user_data: Optional[Dict[str, Any]]):
+        """Put back a member whose sync hit a rate limit, unless a newer row was queued meanwhile."""
+        self.requeued += 1
+        if discord_id not in self._pending:
+            self.submit(discord_id, user_data)
+
+    def record(self, bot_id: int, changed: bool):
+        counts = self.updated if changed else self.skipped
+        counts[bot_id] = counts.get(bot_id, 0) + 1
+
+    def stats(self):
+        return {
+            "queued": len(self._pending),
+            "updated": sum(self.updated.values()),
+            "skipped": sum(self.skipped.values()),
+            "requeued": self.requeued,
+            "by_bot": {bot_id: {"updated": self.updated.get(bot_id, 0), "skipped": self.skipped.get(bot_id, 0)}
+                       for bot_id in sorted(self.updated.keys() | self.skipped.keys())},
+        }
+
+    async def take(self) -> Tuple[int, Optional[Dict[str, Any]]]:
+        discord_id = await self._get_queue().get()
+        return discord_id, self._pending.pop(discord_id)
+
+    def __len__(self):
+        return len(self._pending)
+
+
+member_sync_queue = MemberSyncQueue()
@@ -0,0 +1,77 @@
+import asyncio
+import os
+import time
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+VALORANTSL_API_URL = os.getenv('VALORANTSL_API_URL')
+# Fetches within this many seconds of each other share one snapshot, so both bots reuse a single request
+LEADERBOARD_SNAPSHOT_MAX_AGE = int(os.getenv('LEADERBOARD_SNAPSHOT_MAX_AGE', 60))
+
+
+class LeaderboardIndex:
+    """One fetched leaderboard snapshot, indexed for O(1) member lookups."""
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+        self.by_discord_id: Dict[int, Dict[str, Any]] = {}
+        self.by_username: Dict[str, Dict[str, Any]] = {}
+        # Rows are in elo order; keep the first match like the previous linear scan did
+        for row in rows:
+            self.by_discord_id.setdefault(int(row['discord_id']), row)
+            self.by_username.setdefault(row['discord_username'], row)
+        # All rows ordered by discord_id, for ID range lookups
+        by_id = sorted(rows, key=lambda row: int(row['discord_id']))
+        self._ids = [int(row['discord_id']) for row in by_id]
+        self._rows_by_id = by_id
+
+    def near(self, discord_id: int, distance: int) -> List[Dict[str, Any]]:
+        """Rows whose discord_id is within ``distance`` of ``discord_id`` (inclusive)."""
+        start = bisect_left(self._ids, discord_id - distance)
+        end = bisect_right(self._ids, discord_id + distance)
+        return self._rows_by_id[start:end]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class SharedLeaderboard:
+    """Leaderboard snapshot shared by both bots, revalidated with the API's ETag."""
+
+    def __init__(self):
+        self.index: Optional[LeaderboardIndex] = None
+        self.etag: Optional[str] = None
+        self.fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self, logger, max_age: float = LEADERBOARD_SNAPSHOT_MAX_AGE) -> Optional[LeaderboardIndex]:
+        async with self._lock:
+            if self.index is not None and time.monotonic() - self.fetched_at < max_age:
+                return self.index
+
+            headers = {'If-None-Match': self.etag} if self.etag else {}
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f'{VALORANTSL_API_URL}/valorant/leaderboard/discord',
+                                       headers=headers) as response:
+                    if response.status == 304:
+                        logger.info("Leaderboard data unchanged since the last fetch")
+                    elif response.status == 200:
+                        logger.info("Successfully retrieved leaderboard data")
+                        columns = await response.json()
+                        # Rebuild one row per account from the columnar payload
+                        self.index = LeaderboardIndex([dict(zip(columns, row)) for row in zip(*columns.values())])
+                        self.etag = response.headers.get('ETag')
+                    else:
+                        logger.error(f"Failed to get leaderboard data: HTTP {response.status}")
+                        return None
+
+            self.fetched_at = time.monotonic()
+            return self.index
+
+
+shared_leaderboard = SharedLeaderboard()
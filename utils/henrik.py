@@ -0,0 +1,82 @@
+import copy
+import os
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+from utils.cache import AsyncTTLCache
+from utils.misc import fetch_json
+from utils.rate_limit import INTERACTIVE, TokenBucketRateLimiter
+
+API_TOKEN = os.getenv('HENRIK_API_TOKEN')
+API_BASE_URL = "https://api.henrikdev.xyz"
+
+HENRIK_CONNECTION_LIMIT = int(os.getenv('HENRIK_CONNECTION_LIMIT', 20))
+HENRIK_CONNECTION_LIMIT_PER_HOST = int(os.getenv('HENRIK_CONNECTION_LIMIT_PER_HOST', 10))
+HENRIK_DNS_CACHE_TTL = int(os.getenv('HENRIK_DNS_CACHE_TTL', 300))
+HENRIK_KEEPALIVE_TIMEOUT = float(os.getenv('HENRIK_KEEPALIVE_TIMEOUT', 60))
+HENRIK_CONNECT_TIMEOUT = float(os.getenv('HENRIK_CONNECT_TIMEOUT', 5))
+HENRIK_READ_TIMEOUT = float(os.getenv('HENRIK_READ_TIMEOUT', 15))
+# Requests allowed per period for our API key tier (basic keys get 30 per minute)
+HENRIK_RATE_LIMIT = int(os.getenv('HENRIK_RATE_LIMIT', 30))
+HENRIK_RATE_LIMIT_PERIOD = float(os.getenv('HENRIK_RATE_LIMIT_PERIOD', 60))
+# Read-through cache for interactive lookups; stale entries are served while they revalidate
+HENRIK_CACHE_SIZE = int(os.getenv('HENRIK_CACHE_SIZE', 2048))
+HENRIK_CACHE_TTL = float(os.getenv('HENRIK_CACHE_TTL', 60))
+HENRIK_CACHE_STALE_TTL = float(os.getenv('HENRIK_CACHE_STALE_TTL', 120))
+
+if not API_TOKEN:
+    raise EnvironmentError("HENRIK_API_TOKEN environment variable not set")
+
+
+class HenrikClient:
+    """App-lifetime client for the Henrik API.
+
+    Holds a single pooled ``aiohttp.ClientSession`` so connections to
+    api.henrikdev.xyz are kept alive and reused across requests instead of
+    paying for a new TCP+TLS handshake on every call. Every request first
+    takes a token from the shared rate limiter.
+    """
+
+    def __init__(self):
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.headers = {'Authorization': f'{API_TOKEN}'}
+        self.limiter = TokenBucketRateLimiter(HENRIK_RATE_LIMIT, HENRIK_RATE_LIMIT_PERIOD)
+        self.cache = AsyncTTLCache(HENRIK_CACHE_SIZE, HENRIK_CACHE_TTL, HENRIK_CACHE_STALE_TTL)
+
+    async def start(self):
+        if self.session is not None and not self.session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=HENRIK_CONNECTION_LIMIT,
+            limit_per_host=HENRIK_CONNECTION_LIMIT_PER_HOST,
+            ttl_dns_cache=HENRIK_DNS_CACHE_TTL,
+            use_dns_cache=True,
+            keepalive_timeout=HENRIK_KEEPALIVE_TIMEOUT,
+        )
+        timeout = aiohttp.ClientTimeout(
+            sock_connect=HENRIK_CONNECT_TIMEOUT,
+            sock_read=HENRIK_READ_TIMEOUT,
+        )
+        self.session = aiohttp.ClientSession(base_url=API_BASE_URL, connector=connector, timeout=timeout)
+
+    async def close(self):
+        await self.limiter.close()
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def get_json(self, path: str, lane: str = INTERACTIVE) -> Dict[str, Any]:
+        if self.session is None or self.session.closed:
+            await self.start()
+        return await fetch_json(self.session, path, self.headers, limiter=self.limiter, lane=lane)
+
+    async def get_json_cached(self, path: str, lane: str = INTERACTIVE) -> Dict[str, Any]:
+        """``get_json`` through the read-through cache, keyed by path (endpoint and puuid).
+
+        Callers get their own copy, so mutating the result never touches the cached entry.
+        """
+        return copy.deepcopy(await self.cache.get(path, lambda: self.get_json(path, lane=lane)))
+
+
+henrik = HenrikClient()
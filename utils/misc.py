@@ -1,11 +1,23 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 import aiohttp
 from fastapi import HTTPException
 
+from utils.rate_limit import INTERACTIVE, TokenBucketRateLimiter
 
-async def fetch_json(session: aiohttp.ClientSession, url: str, headers: Dict[str, str]) -> Dict[str, Any]:
-    async with session.get(url, headers=headers) as response:
-        if response.status != 200:
-            raise HTTPException(status_code=response.status, detail=f"Failed to fetch data from {url}")
-        return await response.json()
+
+async def fetch_json(session: aiohttp.ClientSession, url: str, headers: Dict[str, str],
+                     limiter: Optional[TokenBucketRateLimiter] = None, lane: str = INTERACTIVE,
+                     max_rate_limit_retries: int = 3) -> Dict[str, Any]:
+    for attempt in range(max_rate_limit_retries + 1):
+        if limiter:
+            await limiter.acquire(lane)
+        async with session.get(url, headers=headers) as response:
+            if limiter:
+                limiter.update_from_response(response.status, response.headers)
+                # The limiter now holds every caller back until Retry-After has passed
+                if response.status == 429 and attempt < max_rate_limit_retries:
+                    continue
+            if response.status != 200:
+                raise HTTPException(status_code=response.status, detail=f"Failed to fetch data from {url}")
+            return await response.json()
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+
+def _header_float(headers: Mapping[str, str], name: str) -> Optional[float]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class TokenBucketRateLimiter:
+    """Process-wide async token bucket shared by every Henrik API call.
+
+    The bucket is sized to the API key tier (``rate`` requests per ``per``
+    seconds) and is corrected from the ``x-ratelimit-*`` and ``Retry-After``
+    headers Henrik returns. Waiters are queued per lane and served
+    round-robin, so registration traffic is never starved by a refresh sweep.
+    """
+
+    def __init__(self, rate: int, per: float, lanes=(INTERACTIVE, BACKGROUND)):
+        self.capacity = float(rate)
+        self.tokens = float(rate)
+        self.refill_rate = rate / per
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self._lanes = list(lanes)
+        self._waiters: Dict[str, deque] = {lane: deque() for lane in self._lanes}
+        self._next_lane = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def _seconds_until_token(self) -> float:
+        now = time.monotonic()
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.refill_rate
+
+    def _pop_waiter(self) -> Optional[asyncio.Future]:
+        for offset in range(len(self._lanes)):
+            index = (self._next_lane + offset) % len(self._lanes)
+            waiters = self._waiters[self._lanes[index]]
+            while waiters:
+                future = waiters.popleft()
+                if not future.done():
+                    self._next_lane = (index + 1) % len(self._lanes)
+                    return future
+        return None
+
+    def _has_waiters(self) -> bool:
+        return any(self._waiters.values())
+
+    async def _dispatch(self):
+        while True:
+            if not self._has_waiters():
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self._seconds_until_token()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            future = self._pop_waiter()
+            if future is not None:
+                self.tokens -= 1
+                future.set_result(None)
+
+    async def acquire(self, lane: str = INTERACTIVE):
+        if lane not in self._waiters:
+            raise ValueError(f"Unknown rate limiter lane: {lane}")
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[lane].append(future)
+        self._wakeup.set()
+        await future
+
+    def update_from_response(self, status: int, headers: Mapping[str, str]):
+        """Reconcile the local bucket with the quota Henrik reports."""
+        now = time.monotonic()
+        limit = _header_float(headers, 'x-ratelimit-limit')
+        remaining = _header_float(headers, 'x-ratelimit-remaining')
+        reset = _header_float(headers, 'x-ratelimit-reset')
+        retry_after = _header_float(headers, 'Retry-After')
+
+        self._refill()
+        if limit is not None and limit > 0:
+            self.capacity = limit
+        if remaining is not None:
+            self.tokens = min(self.tokens, remaining)
+
+        if status == 429:
+            wait = retry_after if retry_after is not None else reset
+            if wait is None:
+                wait = 1 / self.refill_rate
+            self.tokens = 0
+            self.blocked_until = max(self.blocked_until, now + wait)
+            logger.warning(f"Henrik API rate limited, pausing requests for {wait:.1f}s")
+        elif remaining is not None and remaining <= 0 and reset is not None:
+            self.blocked_until = max(self.blocked_until, now + reset)
+
+    async def close(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for waiters in self._waiters.values():
+            while waiters:
+                future = waiters.popleft()
+                if not future.done():
+                    future.cancel()
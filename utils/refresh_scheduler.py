@@ -0,0 +1,137 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Dict, Optional, Set
+
+
+class RefreshMetrics:
+    def __init__(self):
+        self.succeeded = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.retries = 0
+        self.started_at = time.monotonic()
+
+    @property
+    def duration(self):
+        return time.monotonic() - self.started_at
+
+    @property
+    def throughput(self):
+        duration = self.duration
+        return (self.succeeded + self.unchanged + self.failed) / duration if duration > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            "succeeded": self.succeeded,
+            "unchanged": self.unchanged,
+            "failed": self.failed,
+            "retries": self.retries,
+            "uptime_seconds": round(self.duration, 2),
+            "throughput_per_second": round(self.throughput, 3),
+        }
+
+
+class RefreshScheduler:
+    """Priority queue of players keyed by the time their next refresh is due.
+
+    Entries pushed with ``urgent`` (on-demand refreshes) are served before
+    every regular entry. Rescheduling a player invalidates its previous heap
+    entry lazily, so each player is queued at most once. A player taken off the
+    queue stays in flight until ``done()``; scheduling it in the meantime is held
+    back until then, so two workers never refresh the same player at once.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._entries: Dict[str, tuple] = {}
+        self._in_flight: Set[str] = set()
+        self._deferred: Dict[str, tuple] = {}
+        self._counter = itertools.count()
+        self._changed: Optional[asyncio.Event] = None
+        self.metrics = RefreshMetrics()
+
+    def _notify(self):
+        if self._changed is not None:
+            self._changed.set()
+
+    @staticmethod
+    def _replaces(current: Optional[tuple], entry: tuple) -> bool:
+        # A later regular request never demotes an entry that is already urgent
+        return current is None or current[0] != 0 or entry[0] == 0
+
+    def schedule(self, puuid: str, delay: float = 0, urgent: bool = False):
+        due = time.monotonic() + delay
+        entry = (0 if urgent else 1, due, next(self._counter), puuid)
+        if puuid in self._in_flight:
+            if self._replaces(self._deferred.get(puuid), entry):
+                self._deferred[puuid] = entry
+            return
+        if not self._replaces(self._entries.get(puuid), entry):
+            return
+        self._entries[puuid] = entry
+        heapq.heappush(self._heap, entry)
+        self._notify()
+
+    def schedule_now(self, puuid: str, urgent: bool = False):
+        self.schedule(puuid, 0, urgent=urgent)
+
+    def done(self, puuid: str):
+        """Mark a popped player's refresh as finished and queue whatever was scheduled meanwhile."""
+        self._in_flight.discard(puuid)
+        entry = self._deferred.pop(puuid, None)
+        if entry is not None and self._replaces(self._entries.get(puuid), entry):
+            self._entries[puuid] = entry
+            heapq.heappush(self._heap, entry)
+            self._notify()
+
+    def remove(self, puuid: str):
+        self._entries.pop(puuid, None)
+        self._deferred.pop(puuid, None)
+
+    def __contains__(self, puuid: str):
+        return puuid in self._entries or puuid in self._in_flight
+
+    def _peek(self):
+        while self._heap and self._entries.get(self._heap[0][3]) is not self._heap[0]:
+            heapq.heappop(self._heap)
+        return self._heap[0] if self._heap else None
+
+    async def pop_due(self) -> str:
+        """Wait for the next player whose refresh is due and take it off the queue."""
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        while True:
+            entry = self._peek()
+            if entry is not None:
+                urgent_rank, due, _, puuid = entry
+                delay = due - time.monotonic()
+                if urgent_rank == 0 or delay <= 0:
+                    heapq.heappop(self._heap)
+                    del self._entries[puuid]
+                    self._in_flight.add(puuid)
+                    return puuid
+            else:
+                delay = None
+
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self):
+        now = time.monotonic()
+        overdue = [due for urgent_rank, due, _, _ in self._entries.values() if due <= now or urgent_rank == 0]
+        return {
+            "queue_depth": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "overdue": len(overdue),
+            "urgent": sum(1 for entry in self._entries.values() if entry[0] == 0),
+            "lag_seconds": round(now - min(overdue), 2) if overdue else 0.0,
+            "refresh": self.metrics.to_dict(),
+        }
+
+
+refresh_scheduler = RefreshScheduler()
@@ -0,0 +1,52 @@
+"""Single-pass JSON encoding of account documents.
+
+Account documents are projected straight from raw BSON dicts (``as_pymongo()``
+or ``Document.to_mongo()``) and encoded once with orjson, instead of going
+through ``json.loads(doc.to_json())`` and a second encode by FastAPI.
+"""
+import calendar
+from datetime import datetime
+from typing import Any, Dict, Iterable
+
+import orjson
+from fastapi.responses import Response
+
+ACCOUNT_FIELDS = ('puuid', 'name', 'tag', 'region', 'rank_details', 'discord_id', 'discord_username')
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, datetime):
+        # Same legacy extended JSON shape (epoch milliseconds) that Document.to_json() emits
+        return {"$date": calendar.timegm(obj.timetuple()) * 1000 + obj.microsecond // 1000}
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+def project_account(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only the public account fields of a raw account document."""
+    return {field: raw[field] for field in ACCOUNT_FIELDS if field in raw}
+
+
+def document_to_account(document) -> Dict[str, Any]:
+    return project_account(document.to_mongo())
+
+
+def encode_accounts(raw_accounts: Iterable[Dict[str, Any]]) -> bytes:
+    return dumps([project_account(raw) for raw in raw_accounts])
+
+
+def join_encoded(items: Iterable[bytes]) -> bytes:
+    """Build a JSON array from already encoded items without decoding them."""
+    return b'[' + b','.join(items) + b']'
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
@@ -1,11 +1,33 @@
 import asyncio
 import logging
 import os
+import random
 import time
-
-import aiohttp
-
-VALORANTSL_API_URL = os.getenv("VALORANTSL_API_URL", "http://fastapi:8000")
+from datetime import datetime
+
+from services.accounts import get_all_puuids, get_top_puuids
+from services.leaderboard import leaderboard
+from services.valorant import AccountNotFound, load_account, refresh_account
+from utils.rate_limit import BACKGROUND
+from utils.refresh_scheduler import refresh_scheduler
+
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", 4))
+UPDATE_MAX_RETRIES = int(os.getenv("UPDATE_MAX_RETRIES", 3))
+UPDATE_RETRY_BASE_DELAY = float(os.getenv("UPDATE_RETRY_BASE_DELAY", 2))
+# A player's refresh ignores its mmr-history watermark when its last full refresh is older than this
+UPDATE_FULL_REFRESH_INTERVAL = int(os.getenv("UPDATE_FULL_REFRESH_INTERVAL", 60 * 60 * 6))
+# How often the schedule is reconciled with the accounts in the database
+UPDATE_RESYNC_INTERVAL = int(os.getenv("UPDATE_RESYNC_INTERVAL", 60 * 10))
+UPDATE_TOP_PLAYERS = int(os.getenv("UPDATE_TOP_PLAYERS", 50))
+TOP_PLAYER_POLL_INTERVAL = int(os.getenv("TOP_PLAYER_POLL_INTERVAL", 60 * 10))
+
+# (days since the last elo change, seconds until the next poll); less active players are polled less often
+ACTIVITY_POLL_INTERVALS = [
+    (1, 60 * 15),
+    (7, 60 * 60 * 2),
+    (30, 60 * 60 * 6),
+]
+INACTIVE_POLL_INTERVAL = 60 * 60 * 24
 
 
 class ScriptFilter(logging.Filter):
@@ -29,51 +51,146 @@ logger.addHandler(handler)
 
 
 class UpdateAllUsersBackgroundRunner:
-
-    async def get_all_puuids(self, session):
+    """Keeps ranks fresh by draining the refresh scheduler with a pool of workers.
+
+    Each player is due again after an interval based on how recently they played
+    and whether they are near the top of the leaderboard. New registrations and
+    on-demand refreshes are pushed onto the scheduler by the API routes.
+    """
+
+    def __init__(self, concurrency=UPDATE_CONCURRENCY, max_retries=UPDATE_MAX_RETRIES, scheduler=refresh_scheduler):
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.scheduler = scheduler
+        self.top_players = set()
+        # puuid -> monotonic time of the last refresh that ignored the watermark
+        self.last_full_refresh = {}
+        self.attempts = {}
+
+    async def get_all_puuids(self):
         try:
-            async with session.get(f'{VALORANTSL_API_URL}/valorant/account/all/puuids') as response:
-                if response.status == 200:
-                    logging.info(f"Successfully retrieved {len(await response.json())} PUUIDs")
-                    return await response.json()
-                else:
-                    logging.error(f"Failed to get PUUIDs: HTTP {response.status}")
-                    return None
+            puuid_list = await get_all_puuids()
+            logging.info(f"Successfully retrieved {len(puuid_list)} PUUIDs")
+            return puuid_list
         except Exception as e:
             logging.error(f"Exception occurred while getting PUUIDs: {e}")
             return None
 
-    async def update_account(self, session, puuid):
-        max_retries = 3
-        for attempt in range(1, max_retries + 1):
-            try:
-                async with session.put(f'{VALORANTSL_API_URL}/valorant/update/rank/{puuid}') as response:
-                    if response.status == 200:
-                        logging.info(f"Successfully updated account: {puuid}")
-                        return await response.json()
-                    else:
-                        logging.error(f"Attempt {attempt} - Failed to update account {puuid}: HTTP {response.status}")
-            except Exception as e:
-                logging.error(f"Attempt {attempt} - Exception while updating account {puuid}: {e}")
+    async def resync(self):
+        puuid_list = await self.get_all_puuids()
+        if puuid_list is None:
+            return
+
+        known = set(puuid_list)
+        for puuid in list(self.last_full_refresh):
+            if puuid not in known:
+                self.scheduler.remove(puuid)
+                self.last_full_refresh.pop(puuid, None)
+        for puuid in puuid_list:
+            # Queued and in-flight players are both "in" the scheduler, so a running refresh isn't doubled
+            if puuid not in self.scheduler and puuid not in self.last_full_refresh:
+                self.scheduler.schedule_now(puuid)
 
-            if attempt < max_retries:
-                await asyncio.sleep(2)  # Wait for 2 seconds before retrying
-
-        # After max retries, return None or handle as needed
-        return None
+        try:
+            self.top_players = set(await get_top_puuids(UPDATE_TOP_PLAYERS))
+        except Exception as e:
+            logging.error(f"Exception occurred while getting top players: {e}")
 
-    async def update_all_users(self):
-        async with aiohttp.ClientSession() as session:
-            puuid_list = await self.get_all_puuids(session)
-            if puuid_list:
-                for puuid in puuid_list:
-                    await self.update_account(session, puuid)
-                    time.sleep(2)
+        try:
+            # Safety net for writes that bypassed the snapshot
+            await leaderboard.rebuild()
+        except Exception as e:
+            logging.error(f"Exception occurred while rebuilding the leaderboard snapshot: {e}")
+
+        logging.info(f"Refresh schedule resynced: {self.scheduler.stats()}")
+
+    def poll_interval(self, account):
+        data = account.rank_details.data if account.rank_details else None
+        if data is None or data.last_elo_change_timestamp is None:
+            interval = ACTIVITY_POLL_INTERVALS[0][1]
+        else:
+            days_inactive = (datetime.utcnow() - data.last_elo_change_timestamp).total_seconds() / 86400
+            interval = next((interval for max_days, interval in ACTIVITY_POLL_INTERVALS if days_inactive < max_days),
+                            INACTIVE_POLL_INTERVAL)
+        if account.puuid in self.top_players:
+            interval = min(interval, TOP_PLAYER_POLL_INTERVAL)
+        return interval
+
+    async def update_account(self, puuid):
+        # Runs the refresh in-process; no round trip through our own HTTP API
+        account = await load_account(puuid)
+        now = time.monotonic()
+        incremental = now - self.last_full_refresh.get(puuid, float('-inf')) < UPDATE_FULL_REFRESH_INTERVAL
+        changed = await refresh_account(account, lane=BACKGROUND, incremental=incremental,
+                                        on_written=self.account_written)
+        if not incremental:
+            self.last_full_refresh[puuid] = now
+        self.scheduler.schedule(puuid, self.poll_interval(account))
+        return changed
+
+    def retry_delay(self, attempt):
+        # Exponential backoff with full jitter so failed players don't retry in lockstep
+        return random.uniform(0, UPDATE_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+
+    async def process(self, puuid):
+        metrics = self.scheduler.metrics
+        attempt = self.attempts.get(puuid, 0) + 1
+        try:
+            if await self.update_account(puuid):
+                # Retry bookkeeping is settled once the queued write is flushed
+                logging.info(f"Successfully refreshed account: {puuid}")
+                metrics.succeeded += 1
             else:
-                logging.error("Failed to retrieve PUUID list")
+                metrics.unchanged += 1
+                self.attempts.pop(puuid, None)
+            return
+        except AccountNotFound:
+            self.attempts.pop(puuid, None)
+            self.last_full_refresh.pop(puuid, None)
+            return
+        except Exception as e:
+            logging.error(f"Attempt {attempt} - Failed to update account {puuid}: {e}")
+
+        self.retry(puuid, attempt)
+
+    def account_written(self, puuid, error):
+        # Called when the write-behind batch holding this player's refresh is flushed
+        if error is None:
+            self.attempts.pop(puuid, None)
+            return
+        attempt = self.attempts.get(puuid, 0) + 1
+        logging.error(f"Attempt {attempt} - Failed to write account {puuid}: {error}")
+        self.retry(puuid, attempt)
+
+    def retry(self, puuid, attempt):
+        metrics = self.scheduler.metrics
+        if attempt < self.max_retries:
+            metrics.retries += 1
+            self.attempts[puuid] = attempt
+            self.scheduler.schedule(puuid, self.retry_delay(attempt))
+        else:
+            metrics.failed += 1
+            self.attempts.pop(puuid, None)
+            self.scheduler.schedule(puuid, ACTIVITY_POLL_INTERVALS[0][1])
+
+    async def worker(self):
+        while True:
+            puuid = await self.scheduler.pop_due()
+            try:
+                await self.process(puuid)
+            except Exception as e:
+                logging.error(f"Unexpected error while refreshing {puuid}: {e}")
+            finally:
+                self.scheduler.done(puuid)
 
     async def run_update_all_users(self):
         await asyncio.sleep(20)  # Wait for 20 seconds to ensure the server is fully started
-        while True:
-            await self.update_all_users()
-            await asyncio.sleep(60 * 30)  # 30 min interval
+        # Pacing against the Henrik quota is handled by the shared rate limiter
+        workers = [asyncio.create_task(self.worker()) for _ in range(self.concurrency)]
+        try:
+            while True:
+                await self.resync()
+                await asyncio.sleep(UPDATE_RESYNC_INTERVAL)
+        finally:
+            for worker in workers:
+                worker.cancel()